@@ -16,6 +16,11 @@ def create_app(config_name='default'):
     logger.info(f"Configuration loaded: {config_name}")
 
     # Initialize extensions
+    if app.config['SESSION_TYPE'] == 'redis' and app.config.get('REDIS_URL'):
+        import redis
+        # One connection pool shared by all of the worker's threads
+        pool = redis.ConnectionPool.from_url(app.config['REDIS_URL'], max_connections=64)
+        app.config['SESSION_REDIS'] = redis.Redis(connection_pool=pool)
     Session(app)
     logger.info("Session initialized")
 
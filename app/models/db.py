@@ -13,7 +13,7 @@ def get_db():
         db_path = current_app.config['DATABASE_PATH']
         g.db = sqlite3.connect(db_path)
         g.db.row_factory = sqlite3.Row
-        logger.debug(f"Database connection opened: {db_path}")
+        logger.debug("Database connection opened: %s", db_path)
     return g.db
 
 def close_db(e=None):
@@ -36,21 +36,21 @@ def query_db(query: str, args: tuple = (), one: bool = False) -> Union[List[Dict
         List of dicts, single dict if one=True, or None/empty list on error
     """
     try:
-        logger.debug(f"Executing query: {query[:50]}...")
+        logger.debug("Executing query: %s...", query[:50])
         cur = get_db().execute(query, args)
         rv = cur.fetchall()
         cur.close()
         result = [dict(row) for row in rv]
-        logger.debug(f"Query returned {len(result)} rows")
+        logger.debug("Query returned %s rows", len(result))
 
         if one:
             return result[0] if result else None
         return result
 
     except sqlite3.Error as e:
-        logger.error(f"Database query error: {e}")
-        logger.error(f"Query: {query}")
-        logger.error(f"Args: {args}")
+        logger.error("Database query error: %s", e)
+        logger.error("Query: %s", query)
+        logger.error("Args: %s", args)
         return None if one else []
 
 def execute_db(query: str, args: tuple = ()) -> Optional[int]:
@@ -65,19 +65,19 @@ def execute_db(query: str, args: tuple = ()) -> Optional[int]:
         lastrowid for INSERT, rowcount for UPDATE/DELETE, None on error
     """
     try:
-        logger.debug(f"Executing: {query[:50]}...")
+        logger.debug("Executing: %s...", query[:50])
         db = get_db()
         cur = db.execute(query, args)
         db.commit()
 
         result = cur.lastrowid if cur.lastrowid else cur.rowcount
-        logger.info(f"Database operation successful, result: {result}")
+        logger.debug("Database operation successful, result: %s", result)
         return result
 
     except sqlite3.Error as e:
-        logger.error(f"Database execute error: {e}")
-        logger.error(f"Query: {query}")
-        logger.error(f"Args: {args}")
+        logger.error("Database execute error: %s", e)
+        logger.error("Query: %s", query)
+        logger.error("Args: %s", args)
         return None
 
 def init_db():
@@ -183,7 +183,7 @@ def init_db():
         _add_sample_data()
 
     except sqlite3.Error as e:
-        logger.error(f"Database initialization failed: {e}")
+        logger.error("Database initialization failed: %s", e)
         raise
 
 def _add_sample_data():
@@ -289,7 +289,7 @@ def _add_sample_data():
 
 def get_posts(limit: int = 20) -> List[Dict]:
     """Hent posts for dashboard feed"""
-    logger.debug(f"Fetching {limit} posts")
+    logger.debug("Fetching %s posts", limit)
     return query_db(
         'SELECT * FROM posts ORDER BY created_at DESC LIMIT ?',
         (limit,)
@@ -297,7 +297,7 @@ def get_posts(limit: int = 20) -> List[Dict]:
 
 def create_post(content: str, author_name: str, author_email: str) -> Optional[int]:
     """Opprett nytt innlegg"""
-    logger.info(f"Creating post by {author_name}")
+    logger.info("Creating post by %s", author_name)
     return execute_db(
         'INSERT INTO posts (content, author_name, author_email) VALUES (?, ?, ?)',
         (content, author_name, author_email)
@@ -305,7 +305,7 @@ def create_post(content: str, author_name: str, author_email: str) -> Optional[i
 
 def get_recent_events(limit: int = 5) -> List[Dict]:
     """Hent kommende kalenderhendelser"""
-    logger.debug(f"Fetching {limit} recent events")
+    logger.debug("Fetching %s recent events", limit)
     return query_db(
         '''SELECT * FROM calendar_events
            WHERE event_date >= date('now')
@@ -324,7 +324,7 @@ def get_task_summary() -> Dict[str, int]:
         if status in summary:
             summary[status] = task['count']
 
-    logger.debug(f"Task summary: {summary}")
+    logger.debug("Task summary: %s", summary)
     return summary
 
 def get_documents_count() -> int:
@@ -341,5 +341,5 @@ def get_user_stats() -> Dict[str, Any]:
         'total_documents': get_documents_count()
     }
 
-    logger.debug(f"User stats: {stats}")
+    logger.debug("User stats: %s", stats)
     return stats
\ No newline at end of file
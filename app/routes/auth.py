@@ -1,14 +1,28 @@
 import logging
-import uuid
+import secrets
 from typing import Optional, Dict, Any, Tuple
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
 import msal
 import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from ..utils.helpers import auth_required
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 logger = logging.getLogger(__name__)
 
+# Keep-alive session for Microsoft Graph, with retries on throttling and
+# transient server errors (urllib3 honours Retry-After on 429)
+_graph_session = requests.Session()
+# The session is shared by every user, so never store cookies from responses
+_graph_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_graph_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 class AuthManager:
     """Manages Microsoft Entra ID authentication using MSAL"""
 
@@ -40,7 +54,7 @@ class AuthManager:
                 logger.info("Microsoft authentication initialized")
                 return True
             except Exception as e:
-                logger.error(f"Authentication configuration error: {str(e)}")
+                logger.error("Authentication configuration error: %s", e)
                 return False
         return True
 
@@ -50,7 +64,7 @@ class AuthManager:
             return None, None
 
         # Generate a unique state parameter for CSRF protection
-        state = str(uuid.uuid4())
+        state = secrets.token_urlsafe(16)
         session['auth_state'] = state
 
         # Build authorization URL
@@ -60,7 +74,7 @@ class AuthManager:
             redirect_uri=current_app.config['REDIRECT_URI']
         )
 
-        logger.info("Generated Microsoft auth URL")
+        logger.debug("Generated Microsoft auth URL")
         return auth_url, state
 
     def handle_callback(self, auth_code: str, state: str) -> Optional[Dict[str, Any]]:
@@ -81,7 +95,7 @@ class AuthManager:
         )
 
         if 'error' in result:
-            logger.error(f"Token acquisition failed: {result.get('error_description')}")
+            logger.error("Token acquisition failed: %s", result.get('error_description'))
             return None
 
         # Store tokens in session
@@ -95,10 +109,9 @@ class AuthManager:
             # Store user information in session
             session['user'] = user_info
             upn = user_info.get('userPrincipalName', '').lower()
-            admin_upns = [upn.lower() for upn in current_app.config['ADMIN_UPNS']]
-            session['is_admin'] = upn in admin_upns
+            session['is_admin'] = upn in current_app.config['ADMIN_UPNS']
 
-            logger.info(f"User logged in: {user_info.get('displayName')} ({upn})")
+            logger.info("User logged in: %s (%s)", user_info.get('displayName'), upn)
 
         # Clear the auth state
         session.pop('auth_state', None)
@@ -118,26 +131,23 @@ class AuthManager:
         }
 
         try:
-            response = requests.get(graph_url, headers=headers, timeout=10)
+            response = _graph_session.get(graph_url, headers=headers, timeout=(3.05, 10))
             response.raise_for_status()
             user_data = response.json()
-            logger.debug(f"Retrieved user profile: {user_data.get('displayName')}")
+            logger.debug("Retrieved user profile: %s", user_data.get('displayName'))
             return user_data
         except requests.RequestException as e:
-            logger.error(f"Failed to fetch user profile: {str(e)}")
+            logger.error("Failed to fetch user profile: %s", e)
             return None
 
     def logout(self) -> str:
         """Clear user session and return Microsoft logout URL"""
         user_name = session.get('user', {}).get('displayName', 'Unknown')
         session.clear()
-        logger.info(f"User logged out: {user_name}")
+        logger.info("User logged out: %s", user_name)
 
-        # Return Microsoft logout URL if configured
-        if current_app.config.get('MS_TENANT_ID'):
-            logout_url = f"{current_app.config['AUTHORITY']}/oauth2/v2.0/logout?post_logout_redirect_uri={current_app.config['BASE_URL']}"
-            return logout_url
-        return current_app.config['BASE_URL']
+        # Return Microsoft logout URL if configured, precomputed in config
+        return current_app.config['LOGOUT_URL']
 
 # Global auth manager instance
 auth_manager = AuthManager()
@@ -145,7 +155,7 @@ auth_manager = AuthManager()
 @bp.route('/login')
 def login():
     """Login side"""
-    logger.info("User accessing login page")
+    logger.debug("User accessing login page")
 
     # Check if Microsoft auth is configured
     if not all([
@@ -174,11 +184,11 @@ def login():
 @bp.route('/callback')
 def callback():
     """Microsoft auth callback"""
-    logger.info("Auth callback received")
+    logger.debug("Auth callback received")
 
     if 'error' in request.args:
         error_msg = request.args.get('error_description', 'Unknown error')
-        logger.error(f"Auth error: {error_msg}")
+        logger.error("Auth error: %s", error_msg)
         flash(f"Login error: {error_msg}", 'error')
         return redirect(url_for('auth.login'))
 
@@ -198,7 +208,7 @@ def callback():
             flash("Authentication failed", 'error')
             return redirect(url_for('auth.login'))
     except Exception as e:
-        logger.error(f"Authentication error: {str(e)}")
+        logger.error("Authentication error: %s", e)
         flash(f"Authentication error: {str(e)}", 'error')
         return redirect(url_for('auth.login'))
 
@@ -13,7 +13,7 @@ logger = logging.getLogger(__name__)
 def index():
     """Kalender hovedside"""
     user_name = get_user_display_name()
-    logger.info(f"Calendar accessed by {user_name}")
+    logger.info("Calendar accessed by %s", user_name)
 
     try:
         # Hent hendelser for neste 30 dager
@@ -50,7 +50,7 @@ def index():
                              user_name=user_name)
 
     except Exception as e:
-        logger.error(f"Error loading calendar: {str(e)}")
+        logger.error("Error loading calendar: %s", e)
         flash('Feil ved lasting av kalender', 'error')
         return render_template('calendar/index.html',
                              events=[],
@@ -94,16 +94,16 @@ def create_event():
         )
 
         if event_id:
-            logger.info(f"Event created by {user_name}: {title} on {event_date}")
+            logger.info("Event created by %s: %s on %s", user_name, title, event_date)
             flash(f'Hendelse "{title}" opprettet!', 'success')
         else:
             flash('Feil ved opprettelse av hendelse', 'error')
 
     except ValueError as e:
-        logger.error(f"Date validation error: {str(e)}")
+        logger.error("Date validation error: %s", e)
         flash('Ugyldig dato eller klokkeslett format', 'error')
     except Exception as e:
-        logger.error(f"Error creating event: {str(e)}")
+        logger.error("Error creating event: %s", e)
         flash('Feil ved opprettelse av hendelse', 'error')
 
     return redirect(url_for('calendar.index'))
@@ -153,16 +153,16 @@ def edit_event(event_id: int):
         )
 
         if result:
-            logger.info(f"Event updated by {user_name}: {title} (ID: {event_id})")
+            logger.info("Event updated by %s: %s (ID: %s)", user_name, title, event_id)
             flash(f'Hendelse "{title}" oppdatert!', 'success')
         else:
             flash('Feil ved oppdatering av hendelse', 'error')
 
     except ValueError as e:
-        logger.error(f"Date validation error: {str(e)}")
+        logger.error("Date validation error: %s", e)
         flash('Ugyldig dato eller klokkeslett format', 'error')
     except Exception as e:
-        logger.error(f"Error updating event: {str(e)}")
+        logger.error("Error updating event: %s", e)
         flash('Feil ved oppdatering av hendelse', 'error')
 
     return redirect(url_for('calendar.index'))
@@ -191,13 +191,13 @@ def delete_event(event_id: int):
         )
 
         if result:
-            logger.info(f"Event deleted by {user_name}: {event['title']} (ID: {event_id})")
+            logger.info("Event deleted by %s: %s (ID: %s)", user_name, event['title'], event_id)
             flash(f'Hendelse "{event["title"]}" slettet', 'success')
         else:
             flash('Feil ved sletting av hendelse', 'error')
 
     except Exception as e:
-        logger.error(f"Error deleting event: {str(e)}")
+        logger.error("Error deleting event: %s", e)
         flash('Feil ved sletting av hendelse', 'error')
 
     return redirect(url_for('calendar.index'))
@@ -236,7 +236,7 @@ def api_events():
         })
 
     except Exception as e:
-        logger.error(f"Error fetching events: {str(e)}")
+        logger.error("Error fetching events: %s", e)
         return jsonify({
             'error': 'Failed to fetch events',
             'status': 'error'
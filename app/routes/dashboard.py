@@ -17,7 +17,7 @@ def index():
     """Dashboard hovedside med ekte data"""
     user = get_current_user()
     user_name = get_user_display_name()
-    logger.info(f"Dashboard accessed by {user_name}")
+    logger.info("Dashboard accessed by %s", user_name)
 
     try:
         # Hent dashboard data
@@ -36,11 +36,11 @@ def index():
             'stats': stats
         }
 
-        logger.debug(f"Dashboard data loaded: {len(posts)} posts, {len(upcoming_events)} events")
+        logger.debug("Dashboard data loaded: %s posts, %s events", len(posts), len(upcoming_events))
         return render_template('dashboard/index.html', **dashboard_data)
 
     except Exception as e:
-        logger.error(f"Error loading dashboard data: {str(e)}")
+        logger.error("Error loading dashboard data: %s", e)
         flash('Feil ved lasting av dashboard data', 'error')
 
         # Fallback - enkel dashboard
@@ -72,13 +72,13 @@ def create_post_route():
     try:
         post_id = create_post(content, user_name, user_email)
         if post_id:
-            logger.info(f"Post created by {user_name}: {content[:50]}...")
+            logger.info("Post created by %s: %s...", user_name, content[:50])
             flash('Innlegg opprettet!', 'success')
         else:
             flash('Feil ved opprettelse av innlegg', 'error')
 
     except Exception as e:
-        logger.error(f"Error creating post: {str(e)}")
+        logger.error("Error creating post: %s", e)
         flash('Feil ved opprettelse av innlegg', 'error')
 
     return redirect(url_for('dashboard.index'))
@@ -98,7 +98,7 @@ def api_stats():
         })
 
     except Exception as e:
-        logger.error(f"Error fetching stats: {str(e)}")
+        logger.error("Error fetching stats: %s", e)
         return jsonify({
             'error': 'Failed to fetch statistics',
             'status': 'error'
@@ -121,7 +121,7 @@ def api_posts():
         })
 
     except Exception as e:
-        logger.error(f"Error fetching posts: {str(e)}")
+        logger.error("Error fetching posts: %s", e)
         return jsonify({
             'error': 'Failed to fetch posts',
             'status': 'error'
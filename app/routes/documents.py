@@ -62,7 +62,7 @@ def format_file_size(size_bytes: int) -> str:
 def index(folder: Optional[str] = None):
     """Dokumentbank hovedside"""
     user_name = get_user_display_name()
-    logger.info(f"Documents accessed by {user_name}, folder: {folder}")
+    logger.info("Documents accessed by %s, folder: %s", user_name, folder)
 
     try:
         # Hent dokumenter
@@ -103,7 +103,7 @@ def index(folder: Optional[str] = None):
                              user_name=user_name)
 
     except Exception as e:
-        logger.error(f"Error loading documents: {str(e)}")
+        logger.error("Error loading documents: %s", e)
         flash('Feil ved lasting av dokumenter', 'error')
         return render_template('documents/index.html',
                              documents=[],
@@ -177,7 +177,7 @@ def upload():
         )
 
         if doc_id:
-            logger.info(f"File uploaded by {user_name}: {original_filename} -> {folder}/{filename}")
+            logger.info("File uploaded by %s: %s -> %s/%s", user_name, original_filename, folder, filename)
             flash(f'Fil "{original_filename}" lastet opp til {FOLDER_NAMES[folder]}!', 'success')
         else:
             # Rydd opp fil hvis database feilet
@@ -188,7 +188,7 @@ def upload():
             flash('Feil ved lagring av fil metadata', 'error')
 
     except Exception as e:
-        logger.error(f"Error uploading file: {str(e)}")
+        logger.error("Error uploading file: %s", e)
         flash('Feil ved opplasting av fil', 'error')
 
     return redirect(url_for('documents.index', folder=folder))
@@ -217,7 +217,7 @@ def download(doc_id: int):
             flash('Fil ikke funnet på server', 'error')
             return redirect(url_for('documents.index', folder=doc['folder']))
 
-        logger.info(f"File downloaded by {user_name}: {doc['original_filename']}")
+        logger.info("File downloaded by %s: %s", user_name, doc['original_filename'])
 
         return send_from_directory(
             os.path.join(upload_folder, doc['folder']),
@@ -227,7 +227,7 @@ def download(doc_id: int):
         )
 
     except Exception as e:
-        logger.error(f"Error downloading file: {str(e)}")
+        logger.error("Error downloading file: %s", e)
         flash('Feil ved nedlasting av fil', 'error')
         return redirect(url_for('documents.index'))
 
@@ -262,13 +262,13 @@ def delete(doc_id: int):
         )
 
         if result:
-            logger.info(f"File deleted by {user_name}: {doc['original_filename']}")
+            logger.info("File deleted by %s: %s", user_name, doc['original_filename'])
             flash(f'Dokument "{doc["original_filename"]}" slettet', 'success')
         else:
             flash('Feil ved sletting av dokument', 'error')
 
     except Exception as e:
-        logger.error(f"Error deleting file: {str(e)}")
+        logger.error("Error deleting file: %s", e)
         flash('Feil ved sletting av dokument', 'error')
 
     folder = request.form.get('folder', 'it')
@@ -311,5 +311,5 @@ def api_stats():
         }
 
     except Exception as e:
-        logger.error(f"Error fetching document stats: {str(e)}")
+        logger.error("Error fetching document stats: %s", e)
         return {'error': 'Failed to fetch statistics', 'status': 'error'}, 500
\ No newline at end of file
@@ -27,7 +27,7 @@ TASK_PRIORITIES = {
 def index():
     """Tasks hovedside med Kanban-board"""
     user_name = get_user_display_name()
-    logger.info(f"Tasks accessed by {user_name}")
+    logger.info("Tasks accessed by %s", user_name)
 
     try:
         # Hent alle oppgaver gruppert etter status
@@ -65,7 +65,7 @@ def index():
                              user_name=user_name)
 
     except Exception as e:
-        logger.error(f"Error loading tasks: {str(e)}")
+        logger.error("Error loading tasks: %s", e)
         flash('Feil ved lasting av oppgaver', 'error')
         return render_template('tasks/index.html',
                              tasks_by_status={status: [] for status in TASK_STATUSES.keys()},
@@ -102,13 +102,13 @@ def create_task():
         )
 
         if task_id:
-            logger.info(f"Task created by {user_name}: {title}")
+            logger.info("Task created by %s: %s", user_name, title)
             flash(f'Oppgave "{title}" opprettet!', 'success')
         else:
             flash('Feil ved opprettelse av oppgave', 'error')
 
     except Exception as e:
-        logger.error(f"Error creating task: {str(e)}")
+        logger.error("Error creating task: %s", e)
         flash('Feil ved opprettelse av oppgave', 'error')
 
     return redirect(url_for('tasks.index'))
@@ -141,13 +141,13 @@ def update_task_status(task_id: int):
         )
 
         if result:
-            logger.info(f"Task status updated by {user_name}: {task['title']} -> {new_status}")
+            logger.info("Task status updated by %s: %s -> %s", user_name, task['title'], new_status)
             return jsonify({'message': 'Status updated', 'status': 'success'})
         else:
             return jsonify({'error': 'Failed to update status', 'status': 'error'}), 500
 
     except Exception as e:
-        logger.error(f"Error updating task status: {str(e)}")
+        logger.error("Error updating task status: %s", e)
         return jsonify({'error': 'Failed to update status', 'status': 'error'}), 500
 
 @bp.route('/edit/<int:task_id>', methods=['POST'])
@@ -190,13 +190,13 @@ def edit_task(task_id: int):
         )
 
         if result:
-            logger.info(f"Task updated by {user_name}: {title} (ID: {task_id})")
+            logger.info("Task updated by %s: %s (ID: %s)", user_name, title, task_id)
             flash(f'Oppgave "{title}" oppdatert!', 'success')
         else:
             flash('Feil ved oppdatering av oppgave', 'error')
 
     except Exception as e:
-        logger.error(f"Error updating task: {str(e)}")
+        logger.error("Error updating task: %s", e)
         flash('Feil ved oppdatering av oppgave', 'error')
 
     return redirect(url_for('tasks.index'))
@@ -225,13 +225,13 @@ def delete_task(task_id: int):
         )
 
         if result:
-            logger.info(f"Task deleted by {user_name}: {task['title']} (ID: {task_id})")
+            logger.info("Task deleted by %s: %s (ID: %s)", user_name, task['title'], task_id)
             flash(f'Oppgave "{task["title"]}" slettet', 'success')
         else:
             flash('Feil ved sletting av oppgave', 'error')
 
     except Exception as e:
-        logger.error(f"Error deleting task: {str(e)}")
+        logger.error("Error deleting task: %s", e)
         flash('Feil ved sletting av oppgave', 'error')
 
     return redirect(url_for('tasks.index'))
@@ -266,7 +266,7 @@ def api_tasks():
         })
 
     except Exception as e:
-        logger.error(f"Error fetching tasks: {str(e)}")
+        logger.error("Error fetching tasks: %s", e)
         return jsonify({
             'error': 'Failed to fetch tasks',
             'status': 'error'
@@ -298,7 +298,7 @@ def api_stats():
         })
 
     except Exception as e:
-        logger.error(f"Error fetching task stats: {str(e)}")
+        logger.error("Error fetching task stats: %s", e)
         return jsonify({
             'error': 'Failed to fetch statistics',
             'status': 'error'
@@ -10,7 +10,7 @@ def auth_required(f: Callable) -> Callable:
     @wraps(f)
     def decorated_function(*args: Any, **kwargs: Any) -> Any:
         if 'user' not in session:
-            logger.warning(f"Unauthorized access attempt to {request.endpoint} from {request.remote_addr}")
+            logger.warning("Unauthorized access attempt to %s from %s", request.endpoint, request.remote_addr)
             if request.endpoint and request.endpoint.startswith('api.'):
                 return jsonify({'error': 'Authentication required'}), 401
             return redirect(url_for('auth.login'))
@@ -22,13 +22,13 @@ def admin_required(f: Callable) -> Callable:
     @wraps(f)
     def decorated_function(*args: Any, **kwargs: Any) -> Any:
         if 'user' not in session:
-            logger.warning(f"Unauthorized access attempt to {request.endpoint}")
+            logger.warning("Unauthorized access attempt to %s", request.endpoint)
             return redirect(url_for('auth.login'))
 
         user_upn = session['user'].get('userPrincipalName', '')
         from flask import current_app
-        if user_upn not in current_app.config['ADMIN_UPNS']:
-            logger.warning(f"Non-admin user {user_upn} attempted admin action: {request.endpoint}")
+        if user_upn.lower() not in current_app.config['ADMIN_UPNS']:
+            logger.warning("Non-admin user %s attempted admin action: %s", user_upn, request.endpoint)
             return jsonify({'error': 'Admin access required'}), 403
 
         return f(*args, **kwargs)
@@ -38,7 +38,7 @@ def get_current_user() -> Optional[Dict[str, Any]]:
     """Hent nåværende bruker fra session"""
     user = session.get('user')
     if user:
-        logger.debug(f"Current user: {user.get('displayName', 'Unknown')}")
+        logger.debug("Current user: %s", user.get('displayName', 'Unknown'))
     return user
 
 def is_authenticated() -> bool:
@@ -52,7 +52,7 @@ def is_admin() -> bool:
 
     user_upn = session['user'].get('userPrincipalName', '')
     from flask import current_app
-    return user_upn in current_app.config['ADMIN_UPNS']
+    return user_upn.lower() in current_app.config['ADMIN_UPNS']
 
 def get_user_display_name() -> str:
     """Hent display name for nåværende bruker"""
@@ -1,18 +1,66 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, g, Response
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.utils import secure_filename
 import sqlite3
 import os
-import requests
-from datetime import datetime
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import http.client
+from urllib.parse import quote, urlsplit
+import unicodedata
+from datetime import date, timedelta
 import json
+from json_provider import init_json_provider
+
+# orjson is optional; fall back to the stdlib json module without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
 
 app = Flask(__name__)
+init_json_provider(app)
 app.config['SECRET_KEY'] = 'grm-intranet-secret-key-2023'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 
+# Persist compiled templates across restarts (JINJA_CACHE_DIR, or a per-user
+# temp dir). Template auto-reload already follows debug mode, so production
+# renders skip the per-render mtime check.
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(os.environ.get('JINJA_CACHE_DIR'))
+
+# Let the front-end server transmit downloaded files instead of Python.
+# Apache (mod_xsendfile): USE_X_SENDFILE=true.
+# nginx: X_ACCEL_REDIRECT_PREFIX=/internal-uploads together with
+#   location /internal-uploads/ { internal; alias /app/uploads/; }
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
 # Authentication backend URL
 AUTH_BACKEND_URL = 'http://localhost:5050'
 
+# Seconds to wait for the auth backend. /api/me may refresh the token through
+# MSAL and refetch the Graph profile, each allowed (3.05, 15) seconds there.
+AUTH_BACKEND_TIMEOUT = 40
+
+# Keep-alive connection to the auth backend, one per worker thread
+_AUTH_ADDRESS = urlsplit(AUTH_BACKEND_URL)
+_auth_local = threading.local()
+
+# Marker cached on flask.g when the backend reported "not authenticated"
+_UNAUTH = object()
+
+# Document folders, in display order, and the set used for validation
+DOCUMENT_FOLDERS = ('salg', 'verksted', 'hms', 'it')
+ALLOWED_FOLDERS = frozenset(DOCUMENT_FOLDERS)
+
+# Page size for the documents listing
+DOCUMENTS_PER_PAGE = 50
+
 # Create upload directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'salg'), exist_ok=True)
@@ -20,41 +68,78 @@ os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'verksted'), exist_ok=True
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'hms'), exist_ok=True)
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'it'), exist_ok=True)
 
+# Absolute path of each document folder, resolved once at startup
+_UPLOAD_DIRS = {
+    folder: os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], folder))
+    for folder in DOCUMENT_FOLDERS
+}
+
+
+def _auth_connection(fresh=False):
+    """Get this thread's connection to the auth backend, optionally reopening it."""
+    conn = getattr(_auth_local, 'conn', None)
+    if conn is None or fresh:
+        if conn is not None:
+            conn.close()
+        conn = http.client.HTTPConnection(_AUTH_ADDRESS.hostname, _AUTH_ADDRESS.port,
+                                          timeout=AUTH_BACKEND_TIMEOUT)
+        _auth_local.conn = conn
+    return conn
+
 
 def get_current_user():
     """
     Get current user from authentication backend.
 
+    The result (including a negative one) is cached on flask.g, so the
+    backend is called at most once per request.
+
     Returns:
         dict: User data if authenticated, None if not authenticated
     """
-    try:
-        # Call the authentication backend with the current request cookies
-        response = requests.get(
-            f'{AUTH_BACKEND_URL}/api/me',
-            cookies=request.cookies,
-            timeout=10
-        )
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
-    except requests.RequestException:
-        # If backend is down or unreachable, treat as not authenticated
-        return None
+    cached = g.get('_cached_user')
+    if cached is not None:
+        return None if cached is _UNAUTH else cached
+
+    user = None
+    # Call the authentication backend with the current request cookies
+    headers = {'Cookie': request.headers.get('Cookie', '')}
+    for attempt in range(2):
+        conn = _auth_connection(fresh=attempt > 0)
+        try:
+            conn.request('GET', '/api/me', headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (BrokenPipeError, ConnectionResetError):
+            # The backend closed the kept-alive connection (RemoteDisconnected
+            # is a ConnectionResetError); retry once on a new one
+            conn.close()
+            continue
+        except (http.client.HTTPException, OSError):
+            # If backend is down, unreachable or timed out, treat as not
+            # authenticated rather than sending a slow request again
+            conn.close()
+            break
+        if response.status == 200:
+            user = _json_loads(body)
+        break
+
+    g._cached_user = user if user is not None else _UNAUTH
+    return user
 
 
 def auth_required(f):
     """
     Decorator to require authentication for a route.
     If user is not authenticated, redirect to login.
+    The authenticated user is exposed to the view as g.user.
     """
     def decorated_function(*args, **kwargs):
         user = get_current_user()
         if user is None:
             # Redirect to authentication backend login
             return redirect(f'{AUTH_BACKEND_URL}/auth/login')
+        g.user = user
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
@@ -71,114 +156,151 @@ def admin_required(f):
         if not user.get('is_admin', False):
             flash('Admin privileges required')
             return redirect(url_for('dashboard'))
+        g.user = user
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
 
-def init_db():
-    """Initialize database with required tables (keeping existing structure)."""
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
+# One SQLite connection per worker thread, reused across requests
+_db_local = threading.local()
 
-    # Posts table (newsfeed)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_email TEXT,
-            user_name TEXT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Comments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            post_id INTEGER,
-            user_email TEXT,
-            user_name TEXT,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (post_id) REFERENCES posts (id)
-        )
-    ''')
+def get_db():
+    """
+    Get this thread's database connection, opening it on first use.
 
-    # Documents table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL,
-            original_filename TEXT NOT NULL,
-            folder TEXT NOT NULL,
-            uploaded_by_email TEXT,
-            uploaded_by_name TEXT,
-            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    The connection runs in autocommit mode, returns sqlite3.Row objects and
+    is kept open for the lifetime of the thread, so views should not close it.
+    WAL gives readers a consistent snapshot without waiting on writers.
+    """
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect('database.db', isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA threads=4')
+        conn.row_factory = sqlite3.Row
+        _db_local.conn = conn
+    return conn
+
+
+def fetch_many(cursor, table, ids, cols):
+    """
+    Fetch rows for a batch of ids with one WHERE id IN (...) query.
 
-    # Calendar events table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS calendar_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            start_date DATE NOT NULL,
-            end_date DATE,
-            start_time TIME,
-            end_time TIME,
-            location TEXT,
-            responsible_user_email TEXT,
-            responsible_user_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    Use this instead of querying per row when a list view needs related
+    records (e.g. comments for the posts on the dashboard). `table` and
+    `cols` are trusted identifiers; the first column in `cols` must be id.
 
-    # Tasks/Issues table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            status TEXT DEFAULT 'todo',
-            priority TEXT DEFAULT 'medium',
-            department TEXT,
-            assigned_to_email TEXT,
-            assigned_to_name TEXT,
-            created_by_email TEXT,
-            created_by_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    Returns:
+        dict: Rows keyed by their id
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    placeholders = ','.join('?' * len(ids))
+    cursor.execute(f'SELECT {cols} FROM {table} WHERE id IN ({placeholders})', ids)
+    return {row[0]: row for row in cursor.fetchall()}
+
+
+# Database schema, run as one script by init_db()
+SCHEMA_SQL = '''
+    -- Posts table (newsfeed)
+    CREATE TABLE IF NOT EXISTS posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_email TEXT,
+        user_name TEXT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Comments table
+    CREATE TABLE IF NOT EXISTS comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER,
+        user_email TEXT,
+        user_name TEXT,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (post_id) REFERENCES posts (id)
+    );
+
+    -- Documents table
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        original_filename TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        uploaded_by_email TEXT,
+        uploaded_by_name TEXT,
+        upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Calendar events table
+    CREATE TABLE IF NOT EXISTS calendar_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        start_date DATE NOT NULL,
+        end_date DATE,
+        start_time TIME,
+        end_time TIME,
+        location TEXT,
+        responsible_user_email TEXT,
+        responsible_user_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tasks/Issues table
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'todo',
+        priority TEXT DEFAULT 'medium',
+        department TEXT,
+        assigned_to_email TEXT,
+        assigned_to_name TEXT,
+        created_by_email TEXT,
+        created_by_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Newsletter table
+    CREATE TABLE IF NOT EXISTS newsletters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        sent_date TIMESTAMP,
+        created_by_email TEXT,
+        created_by_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Suppliers table
+    CREATE TABLE IF NOT EXISTS suppliers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        username TEXT,
+        password TEXT,
+        website TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+'''
 
-    # Newsletter table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS newsletters (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            sent_date TIMESTAMP,
-            created_by_email TEXT,
-            created_by_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Suppliers table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS suppliers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            username TEXT,
-            password TEXT,
-            website TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+def init_db():
+    """Initialize database with required tables (keeping existing structure)."""
+    conn = sqlite3.connect('database.db', isolation_level=None)
+    cursor = conn.cursor()
+
+    # Run the whole setup in one transaction, so startup commits once
+    cursor.executescript('BEGIN IMMEDIATE;' + SCHEMA_SQL)
 
     # Create default suppliers if not exists
     cursor.execute('SELECT COUNT(*) FROM suppliers')
@@ -194,10 +316,113 @@ def init_db():
             VALUES (?, ?, ?, ?)
         ''', suppliers_data)
 
+    # Sort keys for the tasks page as generated columns, so the ordering
+    # can be served by an index instead of sorting CASE expressions
+    cursor.execute("PRAGMA table_xinfo(tasks)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'status_rank' not in columns:
+        cursor.execute('''
+            ALTER TABLE tasks ADD COLUMN status_rank INTEGER GENERATED ALWAYS AS (
+                CASE status WHEN 'todo' THEN 1 WHEN 'in_progress' THEN 2 WHEN 'completed' THEN 3 END
+            ) VIRTUAL
+        ''')
+    if 'priority_rank' not in columns:
+        cursor.execute('''
+            ALTER TABLE tasks ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS (
+                CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END
+            ) VIRTUAL
+        ''')
+
+    # Indexes for the WHERE / ORDER BY columns used by the list views
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_folder_date ON documents(folder, upload_date DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_start ON calendar_events(start_date, start_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_newsletters_sent ON newsletters(sent_date DESC) WHERE sent_date IS NOT NULL')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_post ON comments(post_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_sort ON tasks(status_rank, priority_rank, created_at DESC)')
+
     conn.commit()
     conn.close()
 
 
+# SQL for the read views, kept as module constants so every request passes
+# the same string and hits the connection's prepared-statement cache
+_SQL_DASHBOARD_NEWS_ADMIN = '''
+    SELECT 'n' AS k, n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
+    FROM newsletters n
+    ORDER BY n.created_at DESC
+    LIMIT 10
+'''
+
+_SQL_DASHBOARD_NEWS_USER = '''
+    SELECT 'n' AS k, n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
+    FROM newsletters n
+    WHERE n.sent_date IS NOT NULL
+    ORDER BY n.sent_date DESC
+    LIMIT 10
+'''
+
+# Tasks are padded with NULL so all dashboard branches have the same width
+_SQL_DASHBOARD_TASKS = '''
+    SELECT 't', t.id, t.title, t.status, t.priority, t.assigned_to_name, NULL
+    FROM tasks t
+    WHERE t.status != 'completed'
+    ORDER BY t.created_at DESC
+    LIMIT 5
+'''
+
+_SQL_DASHBOARD_EVENTS = '''
+    SELECT 'e', c.id, c.title, c.start_date, c.start_time, c.location, c.responsible_user_name
+    FROM calendar_events c
+    WHERE c.start_date >= date('now')
+    ORDER BY c.start_date, c.start_time
+    LIMIT 5
+'''
+
+# Dashboard widgets in one query; each row is tagged with its source in
+# the first column
+_SQL_DASHBOARD = '''
+    SELECT * FROM ({news})
+    UNION ALL
+    SELECT * FROM ({tasks})
+    UNION ALL
+    SELECT * FROM ({events})
+'''
+_SQL_DASHBOARD_ADMIN = _SQL_DASHBOARD.format(
+    news=_SQL_DASHBOARD_NEWS_ADMIN, tasks=_SQL_DASHBOARD_TASKS, events=_SQL_DASHBOARD_EVENTS)
+_SQL_DASHBOARD_USER = _SQL_DASHBOARD.format(
+    news=_SQL_DASHBOARD_NEWS_USER, tasks=_SQL_DASHBOARD_TASKS, events=_SQL_DASHBOARD_EVENTS)
+
+# Column names per dashboard source; the UNION result only carries the
+# names of its first branch
+_DASHBOARD_COLUMNS = {
+    'n': ('id', 'title', 'content', 'sent_date', 'created_at', 'created_by_name'),
+    't': ('id', 'title', 'status', 'priority', 'assigned_to_name'),
+    'e': ('id', 'title', 'start_date', 'start_time', 'location', 'responsible_user_name'),
+}
+
+_SQL_TASKS_LIST = '''
+    SELECT t.id, t.title, t.description, t.status, t.priority, t.department,
+           t.created_at, t.created_by_name, t.assigned_to_name
+    FROM tasks t
+    ORDER BY t.status_rank, t.priority_rank, t.created_at DESC
+'''
+
+_SQL_CALENDAR = '''
+    SELECT c.id, c.title, c.description, c.start_date, c.end_date,
+           c.start_time, c.end_time, c.location, c.responsible_user_name
+    FROM calendar_events c
+    WHERE c.start_date >= ? AND c.start_date < ?
+    ORDER BY c.start_date, c.start_time
+'''
+
+_SQL_SUPPLIERS = '''
+    SELECT id, name, username, password, website
+    FROM suppliers
+    ORDER BY name ASC
+'''
+
+
 # Routes
 @app.route('/')
 def home():
@@ -209,50 +434,23 @@ def home():
 @auth_required
 def dashboard():
     """Main dashboard page."""
-    user = get_current_user()
+    user = g.user
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    # Get recent newsletters (only sent ones for regular users, all for admin)
+    # Newsletters (only sent ones for regular users, all for admin), open
+    # tasks and upcoming events, fetched in one round-trip
     if user.get('is_admin', False):
-        cursor.execute('''
-            SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
-            FROM newsletters n
-            ORDER BY n.created_at DESC
-            LIMIT 10
-        ''')
+        cursor.execute(_SQL_DASHBOARD_ADMIN)
     else:
-        cursor.execute('''
-            SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
-            FROM newsletters n
-            WHERE n.sent_date IS NOT NULL
-            ORDER BY n.sent_date DESC
-            LIMIT 10
-        ''')
-    newsletters = cursor.fetchall()
+        cursor.execute(_SQL_DASHBOARD_USER)
 
-    # Get recent tasks
-    cursor.execute('''
-        SELECT t.id, t.title, t.status, t.priority, t.assigned_to_name
-        FROM tasks t
-        WHERE t.status != 'completed'
-        ORDER BY t.created_at DESC
-        LIMIT 5
-    ''')
-    tasks = cursor.fetchall()
-
-    # Get upcoming calendar events
-    cursor.execute('''
-        SELECT c.id, c.title, c.start_date, c.start_time, c.location, c.responsible_user_name
-        FROM calendar_events c
-        WHERE c.start_date >= date('now')
-        ORDER BY c.start_date, c.start_time
-        LIMIT 5
-    ''')
-    events = cursor.fetchall()
-
-    conn.close()
+    newsletters, tasks, events = [], [], []
+    buckets = {'n': newsletters, 't': tasks, 'e': events}
+    for row in cursor.fetchall():
+        source = row[0]
+        buckets[source].append(dict(zip(_DASHBOARD_COLUMNS[source], row[1:])))
 
     return render_template('dashboard.html', user=user, newsletters=newsletters, tasks=tasks, events=events)
 
@@ -262,40 +460,76 @@ def dashboard():
 @auth_required
 def documents(folder=None):
     """Documents page."""
-    user = get_current_user()
-    allowed_folders = ['salg', 'verksted', 'hms', 'it']
+    user = g.user
 
-    if folder and folder not in allowed_folders:
+    if folder and folder not in ALLOWED_FOLDERS:
         flash('Ugyldig mappe')
         return redirect(url_for('documents'))
 
-    conn = sqlite3.connect('database.db')
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    conn = get_db()
     cursor = conn.cursor()
 
     if folder:
+        # The window count returns the folder total with the page rows,
+        # so no separate COUNT(*) query is needed
         cursor.execute('''
-            SELECT d.id, d.original_filename, d.filename, d.upload_date, d.uploaded_by_name
+            SELECT d.id, d.original_filename, d.filename, d.upload_date, d.uploaded_by_name,
+                   COUNT(*) OVER () AS total
             FROM documents d
             WHERE d.folder = ?
             ORDER BY d.upload_date DESC
-        ''', (folder,))
+            LIMIT ? OFFSET ?
+        ''', (folder, DOCUMENTS_PER_PAGE, (page - 1) * DOCUMENTS_PER_PAGE))
         documents_list = cursor.fetchall()
+        if not documents_list and page > 1:
+            # Past the last page, e.g. after deletions; start over
+            return redirect(url_for('documents', folder=folder))
+        total = documents_list[0]['total'] if documents_list else 0
     else:
         documents_list = []
-
-    conn.close()
+        total = 0
 
     return render_template('documents.html', user=user,
                          current_folder=folder,
                          documents=documents_list,
-                         folders=allowed_folders)
+                         folders=DOCUMENT_FOLDERS,
+                         page=page,
+                         per_page=DOCUMENTS_PER_PAGE,
+                         total=total)
+
+
+def _finalize_upload(tmp_path, folder, unique_filename, filename, uploader_email, uploader_name):
+    """
+    Move an uploaded temp file into its folder and record it in the database.
+
+    Returns True on success. On failure neither the temp file nor the moved
+    file is left behind.
+    """
+    final_path = os.path.join(_UPLOAD_DIRS[folder], unique_filename)
+    try:
+        os.replace(tmp_path, final_path)
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (unique_filename, filename, folder, uploader_email, uploader_name))
+        return True
+    except Exception:
+        app.logger.exception('Failed to finalize upload %s', unique_filename)
+        for path in (tmp_path, final_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
 
 
 @app.route('/upload_document', methods=['POST'])
 @auth_required
 def upload_document():
     """Handle document upload."""
-    user = get_current_user()
+    user_email, user_name = g.user.get('mail'), g.user.get('displayName')
 
     if 'file' not in request.files:
         flash('Ingen fil valgt')
@@ -308,76 +542,114 @@ def upload_document():
         flash('Vennligst velg fil og mappe')
         return redirect(request.referrer)
 
-    if folder not in ['salg', 'verksted', 'hms', 'it']:
+    if folder not in ALLOWED_FOLDERS:
         flash('Ugyldig mappe')
         return redirect(request.referrer)
 
     if file:
         filename = secure_filename(file.filename)
-        unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], folder, unique_filename)
-        file.save(file_path)
+        # Millisecond timestamp plus random suffix: unique even for uploads in the same second
+        unique_filename = f"{int(time.time() * 1000):x}_{secrets.token_hex(4)}_{filename}"
 
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (unique_filename, filename, folder, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        # Stream the upload into a temp file next to its destination, so a
+        # half-written file never appears under its final name
+        fd, tmp_path = tempfile.mkstemp(dir=_UPLOAD_DIRS[folder], suffix='.part')
+        with os.fdopen(fd, 'wb') as tmp:
+            shutil.copyfileobj(file.stream, tmp, 1 << 20)
 
-        flash(f'Fil "{filename}" lastet opp til {folder.title()}')
+        if _finalize_upload(tmp_path, folder, unique_filename, filename, user_email, user_name):
+            flash(f'Fil "{filename}" lastet opp til {folder.title()}')
+        else:
+            flash(f'Kunne ikke laste opp "{filename}"')
 
     return redirect(url_for('documents', folder=folder))
 
 
+def _attachment_options(download_name):
+    """
+    Content-Disposition parameters for an attachment, encoded like send_file:
+    non-ASCII names get an ASCII fallback plus an RFC 5987 filename*.
+    """
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+    return {'filename': download_name}
+
+
 @app.route('/download/<int:doc_id>')
 @auth_required
 def download_document(doc_id):
     """Download document."""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT filename, original_filename, folder FROM documents WHERE id = ?', (doc_id,))
     doc = cursor.fetchone()
-    conn.close()
 
     if doc:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], doc[2])
-        return send_from_directory(file_path, doc[0], as_attachment=True, download_name=doc[1])
-    else:
-        flash('Fil ikke funnet')
-        return redirect(url_for('documents'))
+        accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+        if accel_prefix:
+            response = Response()
+            response.headers['X-Accel-Redirect'] = quote(f"{accel_prefix.rstrip('/')}/{doc['folder']}/{doc['filename']}")
+            # Headers.set quotes the parameters (e.g. a '"' in the name)
+            response.headers.set('Content-Disposition', 'attachment',
+                                 **_attachment_options(doc['original_filename']))
+            # Let nginx pick the Content-Type from the file extension
+            del response.headers['Content-Type']
+            return response
+        folder_dir = _UPLOAD_DIRS.get(doc['folder'])
+        if folder_dir:
+            return send_from_directory(folder_dir, doc['filename'], as_attachment=True,
+                                       download_name=doc['original_filename'], conditional=True)
+
+    flash('Fil ikke funnet')
+    return redirect(url_for('documents'))
+
+
+def _calendar_grid(year, month):
+    """
+    First and one-past-last day of the six-week grid calendar.html draws
+    for a month: Monday on or before the 1st, then 42 days.
+    """
+    month_start = date(year, month, 1)
+    grid_start = month_start - timedelta(days=month_start.weekday())
+    return grid_start, grid_start + timedelta(days=42)
 
 
 @app.route('/calendar')
 @auth_required
 def calendar():
     """Calendar page."""
-    user = get_current_user()
+    user = g.user
 
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
+    # Month to show, from ?year=&month= (defaults to the current month)
+    today = date.today()
+    year = request.args.get('year', today.year, type=int)
+    month = request.args.get('month', today.month, type=int)
+    try:
+        grid_start, grid_end = _calendar_grid(year, month)
+    except (ValueError, OverflowError):
+        # Invalid month, or a grid running past the representable dates
+        year, month = today.year, today.month
+        grid_start, grid_end = _calendar_grid(year, month)
 
-    # Get all events for the current month
-    cursor.execute('''
-        SELECT c.id, c.title, c.description, c.start_date, c.end_date,
-               c.start_time, c.end_time, c.location, c.responsible_user_name
-        FROM calendar_events c
-        ORDER BY c.start_date, c.start_time
-    ''')
-    events = cursor.fetchall()
+    conn = get_db()
+    cursor = conn.cursor()
 
-    conn.close()
+    # Get the events of every day the month's grid shows
+    cursor.execute(_SQL_CALENDAR, (grid_start.isoformat(), grid_end.isoformat()))
+    # Convert Row objects to dictionaries for JSON serialization
+    events = [dict(event) for event in cursor.fetchall()]
 
-    return render_template('calendar.html', user=user, events=events)
+    return render_template('calendar.html', user=user, events=events, year=year, month=month)
 
 
 @app.route('/create_event', methods=['POST'])
 @auth_required
 def create_event():
     """Create calendar event."""
-    user = get_current_user()
+    user_email, user_name = g.user.get('mail'), g.user.get('displayName')
 
     title = request.form.get('title')
     description = request.form.get('description')
@@ -388,17 +660,21 @@ def create_event():
     location = request.form.get('location')
 
     if title and start_date:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO calendar_events
             (title, description, start_date, end_date, start_time, end_time, location, responsible_user_email, responsible_user_name)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (title, description, start_date, end_date, start_time, end_time, location, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        ''', (title, description, start_date, end_date, start_time, end_time, location, user_email, user_name))
 
         flash('Hendelse opprettet!')
+        # Show the month the new event is in
+        try:
+            event_day = date.fromisoformat(start_date)
+            return redirect(url_for('calendar', year=event_day.year, month=event_day.month))
+        except ValueError:
+            pass
     else:
         flash('Tittel og startdato er påkrevd')
 
@@ -409,32 +685,15 @@ def create_event():
 @auth_required
 def tasks():
     """Tasks page."""
-    user = get_current_user()
+    user = g.user
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get all tasks with user information
-    cursor.execute('''
-        SELECT t.id, t.title, t.description, t.status, t.priority, t.department,
-               t.created_at, t.created_by_name, t.assigned_to_name
-        FROM tasks t
-        ORDER BY
-            CASE t.status
-                WHEN 'todo' THEN 1
-                WHEN 'in_progress' THEN 2
-                WHEN 'completed' THEN 3
-            END,
-            CASE t.priority
-                WHEN 'high' THEN 1
-                WHEN 'medium' THEN 2
-                WHEN 'low' THEN 3
-            END,
-            t.created_at DESC
-    ''')
-    tasks_list = cursor.fetchall()
-
-    conn.close()
+    cursor.execute(_SQL_TASKS_LIST)
+    # Convert Row objects to dictionaries for JSON serialization
+    tasks_list = [dict(task) for task in cursor.fetchall()]
 
     return render_template('tasks.html', user=user, tasks=tasks_list)
 
@@ -443,7 +702,7 @@ def tasks():
 @auth_required
 def create_task():
     """Create task."""
-    user = get_current_user()
+    user_email, user_name = g.user.get('mail'), g.user.get('displayName')
 
     title = request.form.get('title')
     description = request.form.get('description')
@@ -452,14 +711,12 @@ def create_task():
     assigned_to = request.form.get('assigned_to')
 
     if title:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO tasks (title, description, priority, department, assigned_to_name, created_by_email, created_by_name)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (title, description, priority, department, assigned_to or None, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        ''', (title, description, priority, department, assigned_to or None, user_email, user_name))
 
         flash('Oppgave opprettet!')
     else:
@@ -476,12 +733,10 @@ def update_task_status():
     new_status = request.form.get('status')
 
     if task_id and new_status in ['todo', 'in_progress', 'completed']:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
                       (new_status, task_id))
-        conn.commit()
-        conn.close()
 
         flash('Oppgavestatus oppdatert!')
     else:
@@ -494,9 +749,9 @@ def update_task_status():
 @auth_required
 def newsletter():
     """Newsletter page."""
-    user = get_current_user()
+    user = g.user
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get all newsletters
@@ -507,8 +762,6 @@ def newsletter():
     ''')
     newsletters = cursor.fetchall()
 
-    conn.close()
-
     return render_template('newsletter.html', user=user, newsletters=newsletters)
 
 
@@ -516,20 +769,18 @@ def newsletter():
 @admin_required
 def create_newsletter():
     """Create newsletter."""
-    user = get_current_user()
+    user_email, user_name = g.user.get('mail'), g.user.get('displayName')
 
     title = request.form.get('title')
     content = request.form.get('content')
 
     if title and content:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO newsletters (title, content, created_by_email, created_by_name)
             VALUES (?, ?, ?, ?)
-        ''', (title, content, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        ''', (title, content, user_email, user_name))
 
         flash('Nyhetsbrev opprettet!')
     else:
@@ -542,11 +793,9 @@ def create_newsletter():
 @admin_required
 def send_newsletter(newsletter_id):
     """Send newsletter."""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('UPDATE newsletters SET sent_date = CURRENT_TIMESTAMP WHERE id = ?', (newsletter_id,))
-    conn.commit()
-    conn.close()
 
     flash('Nyhetsbrev sendt! (Simulert - e-postintegrasjon må implementeres)')
     return redirect(url_for('newsletter'))
@@ -556,21 +805,15 @@ def send_newsletter(newsletter_id):
 @auth_required
 def suppliers():
     """Suppliers page."""
-    user = get_current_user()
+    user = g.user
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get all suppliers ordered alphabetically
-    cursor.execute('''
-        SELECT id, name, username, password, website
-        FROM suppliers
-        ORDER BY name ASC
-    ''')
+    cursor.execute(_SQL_SUPPLIERS)
     suppliers_list = cursor.fetchall()
 
-    conn.close()
-
     return render_template('suppliers.html', user=user, suppliers=suppliers_list)
 
 
@@ -584,14 +827,12 @@ def add_supplier():
     website = request.form.get('website')
 
     if name:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO suppliers (name, username, password, website)
             VALUES (?, ?, ?, ?)
         ''', (name, username, password, website))
-        conn.commit()
-        conn.close()
 
         flash('Leverandør lagt til!')
     else:
@@ -611,15 +852,13 @@ def update_supplier():
     website = request.form.get('website')
 
     if supplier_id and name:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE suppliers
             SET name = ?, username = ?, password = ?, website = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
         ''', (name, username, password, website, supplier_id))
-        conn.commit()
-        conn.close()
 
         flash('Leverandør oppdatert!')
     else:
@@ -632,11 +871,9 @@ def update_supplier():
 @auth_required
 def delete_supplier(supplier_id):
     """Delete supplier."""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('DELETE FROM suppliers WHERE id = ?', (supplier_id,))
-    conn.commit()
-    conn.close()
 
     flash('Leverandør slettet!')
     return redirect(url_for('suppliers'))
@@ -646,20 +883,18 @@ def delete_supplier(supplier_id):
 @auth_required
 def create_post():
     """Create dashboard post."""
-    user = get_current_user()
+    user_email, user_name = g.user.get('mail'), g.user.get('displayName')
 
     title = request.form.get('title')
     content = request.form.get('content')
 
     if title and content:
-        conn = sqlite3.connect('database.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO posts (user_email, user_name, title, content)
             VALUES (?, ?, ?, ?)
-        ''', (user.get('mail'), user.get('displayName'), title, content))
-        conn.commit()
-        conn.close()
+        ''', (user_email, user_name, title, content))
 
         flash('Innlegg publisert!')
     else:
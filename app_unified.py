@@ -2,18 +2,38 @@
 Unified GRM Intranet application with integrated Microsoft Entra ID authentication.
 Combines the main intranet functionality with authentication backend in a single Flask app.
 """
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session, g, current_app, Response
 from flask_session import Session
 from werkzeug.utils import secure_filename
 import sqlite3
 import os
-import uuid
+import queue
+import threading
+import time
+import secrets
+import shutil
+import tempfile
+import unicodedata
 import msal
 import requests
-from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import quote
+from datetime import timedelta
 import json
-from functools import wraps
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 from dotenv import load_dotenv
+from json_provider import init_json_provider
+
+# orjson is optional; fall back to the stdlib json module without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
 
 # Load environment variables
 load_dotenv()
@@ -34,12 +54,16 @@ class Config:
     BASE_URL = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
     REDIRECT_URI = f"{BASE_URL}/auth/callback"
 
-    # Admin users (comma-separated UPNs)
-    ADMIN_UPNS = [upn.strip() for upn in os.environ.get('ADMIN_UPNS', '').split(',') if upn.strip()]
+    # Admin users (comma-separated UPNs), lowercased for case-insensitive lookup
+    ADMIN_UPNS = frozenset(upn for upn in (entry.strip().lower() for entry in os.environ.get('ADMIN_UPNS', '').split(',')) if upn)
 
-    # Session configuration
-    SESSION_TYPE = str(os.environ.get('SESSION_TYPE', 'filesystem'))
+    # Session configuration (Redis by default; set SESSION_TYPE=filesystem
+    # for local development without a Redis server)
+    SESSION_TYPE = str(os.environ.get('SESSION_TYPE', 'redis'))
+    REDIS_URL = os.environ.get('REDIS_URL')
     SESSION_PERMANENT = False
+    # Also used by Flask-Session as the Redis key TTL
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
     SESSION_USE_SIGNER = True
     SESSION_KEY_PREFIX = str(os.environ.get('SESSION_KEY_PREFIX', 'intranet:'))
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -48,7 +72,6 @@ class Config:
     SESSION_COOKIE_NAME = str(os.environ.get('SESSION_COOKIE_NAME', 'session'))
     SESSION_COOKIE_DOMAIN = os.environ.get('SESSION_COOKIE_DOMAIN')  # None for localhost
     SESSION_COOKIE_PATH = str(os.environ.get('SESSION_COOKIE_PATH', '/'))
-    SESSION_FILE_THRESHOLD = int(os.environ.get('SESSION_FILE_THRESHOLD', 500))
 
     # Microsoft Graph API scopes
     SCOPES = [
@@ -57,6 +80,7 @@ class Config:
 
     # Microsoft endpoints
     AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+    LOGOUT_URL = f"{AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={BASE_URL}"
 
     @classmethod
     def validate_config(cls):
@@ -85,6 +109,15 @@ class Config:
         return True
 
 
+# Graph /me fields kept in the session (everything get_current_user and
+# /api/me expose)
+PROFILE_FIELDS = ('id', 'displayName', 'givenName', 'surname', 'userPrincipalName',
+                  'mail', 'jobTitle', 'department')
+
+# Stand-in state in the cached authorization URL
+_AUTH_STATE_PLACEHOLDER = 'STATE_PLACEHOLDER'
+
+
 # Authentication Manager
 class AuthManager:
     """Manages Microsoft Entra ID authentication using MSAL."""
@@ -93,6 +126,32 @@ class AuthManager:
         """Initialize the authentication manager."""
         self.msal_app = None
         self._initialized = False
+        # Authorization URL with a placeholder state, built on first login
+        self._auth_url_template = None
+        # Shared by every MSAL client so authority discovery is only fetched once
+        self._msal_http_cache = {}
+
+        # Keep-alive session for Microsoft Graph, with retries on throttling
+        # and transient gateway errors
+        self._http = requests.Session()
+        # The session is shared by every user, so never store cookies from responses
+        self._http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._http.headers.update({'Content-Type': 'application/json'})
+        self._http.mount('https://', HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504])
+        ))
+
+    def reset_after_fork(self):
+        """
+        Drop the MSAL client built in a forking parent, together with the
+        kept-alive connection its authority discovery left open. The cached
+        discovery is kept, so the worker rebuilds the client without a
+        network round-trip.
+        """
+        self.msal_app = None
+        self._initialized = False
 
     def _ensure_initialized(self):
         """Lazy initialization of MSAL client."""
@@ -102,30 +161,93 @@ class AuthManager:
                 Config.validate_config()
 
                 # Initialize MSAL confidential client
-                self.msal_app = msal.ConfidentialClientApplication(
-                    Config.CLIENT_ID,
-                    authority=Config.AUTHORITY,
-                    client_credential=Config.CLIENT_SECRET
-                )
+                self.msal_app = self._build_msal_app()
                 self._initialized = True
             except Exception as e:
                 raise ValueError(f"Authentication configuration error: {str(e)}")
 
+    def _build_msal_app(self, cache=None):
+        """Create an MSAL confidential client, optionally bound to a user's token cache."""
+        return msal.ConfidentialClientApplication(
+            Config.CLIENT_ID,
+            authority=Config.AUTHORITY,
+            client_credential=Config.CLIENT_SECRET,
+            token_cache=cache,
+            http_cache=self._msal_http_cache
+        )
+
+    def _load_token_cache(self, user_id):
+        """
+        Load a user's MSAL token cache.
+
+        The cache is stored in Redis under msal:<oid> when Redis sessions are
+        configured, otherwise in the user's session.
+        """
+        cache = msal.SerializableTokenCache()
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None and user_id:
+            data = redis_client.get(f'msal:{user_id}')
+        else:
+            data = session.get('token_cache')
+        if data:
+            cache.deserialize(data)
+        return cache
+
+    def _save_token_cache(self, user_id, cache):
+        """Persist a user's MSAL token cache if MSAL changed it."""
+        if not cache.has_state_changed:
+            return
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None and user_id:
+            redis_client.set(f'msal:{user_id}', cache.serialize(),
+                             ex=int(Config.PERMANENT_SESSION_LIFETIME.total_seconds()))
+        else:
+            session['token_cache'] = cache.serialize()
+
+    def get_access_token(self, user_id=None):
+        """
+        Get an access token for the signed-in user from the token cache.
+
+        MSAL returns the cached token or redeems the cached refresh token, so
+        no interactive login is needed. Returns None if the user has to sign in again.
+        """
+        self._ensure_initialized()
+
+        user_id = user_id or session.get('user_id')
+        cache = self._load_token_cache(user_id)
+        msal_app = self._build_msal_app(cache)
+
+        accounts = msal_app.get_accounts()
+        if not accounts:
+            return None
+
+        result = msal_app.acquire_token_silent(list(Config.SCOPES), account=accounts[0])
+        self._save_token_cache(user_id, cache)
+
+        if not result or 'access_token' not in result:
+            return None
+        return result['access_token']
+
     def get_auth_url(self):
         """Generate the Microsoft login URL."""
         # Ensure MSAL client is initialized
         self._ensure_initialized()
 
         # Generate a unique state parameter for CSRF protection
-        state = str(uuid.uuid4())
+        state = secrets.token_urlsafe(16)
         session['auth_state'] = state
 
-        # Build authorization URL
-        auth_url = self.msal_app.get_authorization_request_url(
-            scopes=list(Config.SCOPES),
-            state=state,
-            redirect_uri=Config.REDIRECT_URI
-        )
+        # Build the authorization URL once; only the state differs per login
+        if self._auth_url_template is None:
+            self._auth_url_template = self.msal_app.get_authorization_request_url(
+                scopes=list(Config.SCOPES),
+                state=_AUTH_STATE_PLACEHOLDER,
+                redirect_uri=Config.REDIRECT_URI
+            )
+
+        # token_urlsafe output needs no URL-encoding
+        auth_url = self._auth_url_template.replace(
+            f'state={_AUTH_STATE_PLACEHOLDER}', f'state={state}')
 
         return auth_url, state
 
@@ -138,8 +260,10 @@ class AuthManager:
         if state != session.get('auth_state'):
             return None
 
-        # Exchange authorization code for access token
-        result = self.msal_app.acquire_token_by_authorization_code(
+        # Exchange authorization code for access token, keeping the tokens
+        # (including the refresh token) in a per-user cache
+        cache = msal.SerializableTokenCache()
+        result = self._build_msal_app(cache).acquire_token_by_authorization_code(
             auth_code,
             scopes=list(Config.SCOPES),
             redirect_uri=Config.REDIRECT_URI
@@ -152,13 +276,13 @@ class AuthManager:
         session['access_token'] = result.get('access_token')
         session['id_token'] = result.get('id_token')
         session['user_id'] = result.get('id_token_claims', {}).get('oid')
+        self._save_token_cache(session['user_id'], cache)
 
-        # Fetch user profile from Microsoft Graph
-        user_info = self.get_user_profile(result.get('access_token'))
+        # Fetch user profile from Microsoft Graph, unless the session already
+        # holds a fresh copy for this user
+        user_info = self.get_user_profile_cached(result.get('access_token'))
         if user_info:
-            # Store user information in session
-            session['user'] = user_info
-            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in [upn.lower() for upn in Config.ADMIN_UPNS]
+            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in Config.ADMIN_UPNS
 
         # Clear the auth state
         session.pop('auth_state', None)
@@ -173,25 +297,48 @@ class AuthManager:
         # Microsoft Graph API endpoint for user profile
         graph_url = 'https://graph.microsoft.com/v1.0/me'
         headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
+            'Authorization': f'Bearer {access_token}'
         }
 
         try:
-            response = requests.get(graph_url, headers=headers, timeout=10)
+            response = self._http.get(graph_url, headers=headers, timeout=10)
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException:
+            # Parse the raw bytes; orjson skips requests' text decode
+            return _json_loads(response.content)
+        except (requests.RequestException, ValueError):
             return None
 
+    def get_user_profile_cached(self, access_token, ttl=3600):
+        """
+        Get the user profile from the session, fetching it from Microsoft Graph
+        only when it is missing, older than ttl seconds or for another user.
+        Without an access_token, one is taken from the user's token cache.
+        """
+        user_info = session.get('user')
+        if (user_info and user_info.get('id') == session.get('user_id')
+                and time.time() - session.get('user_fetched_at', 0) < ttl):
+            return user_info
+
+        user_info = self.get_user_profile(access_token or self.get_access_token())
+        if user_info:
+            # Store only the profile fields the app reads, keeping the session small
+            user_info = {field: user_info.get(field) for field in PROFILE_FIELDS}
+            session['user'] = user_info
+            session['user_fetched_at'] = time.time()
+        return user_info
+
     def logout(self):
         """Clear user session and return Microsoft logout URL."""
+        # Drop the user's cached tokens
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None and session.get('user_id'):
+            redis_client.delete(f"msal:{session['user_id']}")
+
         # Clear all session data
         session.clear()
 
         # Return Microsoft logout URL
-        logout_url = f"{Config.AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={Config.BASE_URL}"
-        return logout_url
+        return Config.LOGOUT_URL
 
     def is_authenticated(self):
         """Check if the current user is authenticated."""
@@ -208,59 +355,95 @@ class AuthManager:
 
 # Create Flask app
 app = Flask(__name__)
+# Serve jsonify responses (/api/me, /api/healthz, errors) through orjson
+init_json_provider(app)
 app.config.from_object(Config)
-app.config['UPLOAD_FOLDER'] = 'uploads'
+# Absolute, because send_from_directory resolves relative paths against the
+# app root rather than the working directory uploads are saved under
+app.config['UPLOAD_FOLDER'] = os.path.abspath('uploads')
+
+# Let the front-end server transmit downloaded files instead of Python.
+# Apache (mod_xsendfile): USE_X_SENDFILE=true.
+# nginx: X_ACCEL_REDIRECT_PREFIX=/internal-uploads together with
+#   location /internal-uploads/ { internal; alias /app/uploads/; }
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
 
 # Configure session management
-if Config.SESSION_TYPE == 'redis' and os.environ.get('REDIS_URL'):
+if Config.SESSION_TYPE == 'redis':
+    if not Config.REDIS_URL:
+        raise ValueError("REDIS_URL must be set when SESSION_TYPE is 'redis'")
     import redis
-    app.config['SESSION_REDIS'] = redis.from_url(os.environ.get('REDIS_URL'))
+    app.config['SESSION_REDIS'] = redis.Redis(
+        connection_pool=redis.ConnectionPool.from_url(Config.REDIS_URL, max_connections=50)
+    )
 else:
     # Use filesystem for session storage (development)
     app.config['SESSION_FILE_DIR'] = os.path.join(os.getcwd(), 'flask_session')
+    app.config['SESSION_FILE_THRESHOLD'] = int(os.environ.get('SESSION_FILE_THRESHOLD', 500))
     os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
 # Initialize session extension
 Session(app)
 
-# Create upload directories
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'salg'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'verksted'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'hms'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'it'), exist_ok=True)
+# Document folders under UPLOAD_FOLDER, in display order, and the set used
+# for validation
+UPLOAD_SUBDIRS = ('salg', 'verksted', 'hms', 'it')
+ALLOWED_FOLDERS = frozenset(UPLOAD_SUBDIRS)
+
+_initialized = False
+
+
+def init_app():
+    """Create the upload directories, once per process."""
+    global _initialized
+    if _initialized:
+        return
+    for sub in UPLOAD_SUBDIRS:
+        path = os.path.join(app.config['UPLOAD_FOLDER'], sub)
+        # makedirs also creates UPLOAD_FOLDER itself
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+    _initialized = True
+
+
+init_app()
 
 # Initialize auth manager
 auth_manager = AuthManager()
 
 
-# Authentication decorators
+# Authentication decorators. Web and API routes get separate decorators,
+# chosen where the route is defined, so the failure response needs no
+# per-request check of the path.
 def auth_required(f):
-    """Decorator to require authentication for a route."""
+    """Decorator to require authentication for a web route (redirects to login)."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not auth_manager.is_authenticated():
-            # For API routes, return JSON error
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
-            # For web routes, redirect to login
             return redirect(url_for('auth_login'))
         return f(*args, **kwargs)
     return decorated_function
 
 
+def api_auth_required(f):
+    """Decorator to require authentication for an API route (JSON 401)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not auth_manager.is_authenticated():
+            return jsonify({'error': 'Authentication required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def admin_required(f):
-    """Decorator to require admin privileges for a route."""
+    """Decorator to require admin privileges for a web route."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not auth_manager.is_authenticated():
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
             return redirect(url_for('auth_login'))
 
         if not session.get('is_admin', False):
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Admin privileges required'}), 403
             flash('Admin privileges required')
             return redirect(url_for('dashboard'))
 
@@ -274,112 +457,241 @@ def get_current_user():
     return auth_manager.get_current_user()
 
 
-# Database initialization
-def init_db():
-    """Initialize database with required tables."""
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
+# Database connection pool
+DB_POOL_SIZE = 8
+_DB_POOL = queue.Queue(maxsize=DB_POOL_SIZE)
 
-    # Posts table (newsfeed)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_email TEXT,
-            user_name TEXT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Comments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            post_id INTEGER,
-            user_email TEXT,
-            user_name TEXT,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (post_id) REFERENCES posts (id)
-        )
+def _open_db_connection():
+    """Open a database connection configured for concurrent use."""
+    conn = sqlite3.connect('database.db', check_same_thread=False, cached_statements=256)
+    # WAL is persistent, so database.db-wal and database.db-shm stay next to
+    # the database between runs
+    conn.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-20000;
     ''')
+    conn.row_factory = sqlite3.Row
+    return conn
 
-    # Documents table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL,
-            original_filename TEXT NOT NULL,
-            folder TEXT NOT NULL,
-            uploaded_by_email TEXT,
-            uploaded_by_name TEXT,
-            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Calendar events table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS calendar_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            start_date DATE NOT NULL,
-            end_date DATE,
-            start_time TIME,
-            end_time TIME,
-            location TEXT,
-            responsible_user_email TEXT,
-            responsible_user_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+def open_db_pool():
+    """Fill a fresh connection pool (at import, and in each forked worker)."""
+    global _DB_POOL
+    _DB_POOL = queue.Queue(maxsize=DB_POOL_SIZE)
+    for _ in range(DB_POOL_SIZE):
+        _DB_POOL.put(_open_db_connection())
 
-    # Tasks/Issues table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            status TEXT DEFAULT 'todo',
-            priority TEXT DEFAULT 'medium',
-            department TEXT,
-            assigned_to_email TEXT,
-            assigned_to_name TEXT,
-            created_by_email TEXT,
-            created_by_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Newsletter table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS newsletters (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            sent_date TIMESTAMP,
-            created_by_email TEXT,
-            created_by_name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+def close_db_pool():
+    """Close the pooled connections, e.g. in a server master before it forks."""
+    while True:
+        try:
+            _DB_POOL.get_nowait().close()
+        except queue.Empty:
+            break
 
-    # Suppliers table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS suppliers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            username TEXT,
-            password TEXT,
-            website TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
 
-    # Create default suppliers if not exists
+open_db_pool()
+
+
+def get_db():
+    """
+    Get a database connection for the current request.
+
+    The connection is borrowed from the pool on first use and returned by
+    release_db() when the app context ends, so views must not close it.
+    """
+    if 'db' not in g:
+        try:
+            g.db = _DB_POOL.get_nowait()
+        except queue.Empty:
+            # All pooled connections are busy, open an extra one
+            g.db = _open_db_connection()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Return the request's database connection to the pool."""
+    conn = g.pop('db', None)
+    if conn is not None:
+        # Discard anything a failed request left uncommitted
+        conn.rollback()
+        try:
+            _DB_POOL.put_nowait(conn)
+        except queue.Full:
+            # Overflow connection opened under load, don't grow the pool
+            conn.close()
+
+
+# Serializes this process's writers so threads wait here instead of
+# contending for SQLite's write lock and failing with SQLITE_BUSY
+_DB_WRITE_LOCK = threading.Lock()
+
+
+@contextmanager
+def db_writer():
+    """
+    Get the request's database connection for writing.
+
+    Writers are serialized on a process-wide lock, and the block is
+    committed on exit or rolled back if it raises.
+    """
+    conn = get_db()
+    with _DB_WRITE_LOCK, conn:
+        yield conn
+
+
+# Bump when SCHEMA_SQL or the migrations in init_db() change
+SCHEMA_VERSION = 2
+
+# Database schema, run as one script by init_db()
+SCHEMA_SQL = '''
+    -- Posts table (newsfeed)
+    CREATE TABLE IF NOT EXISTS posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_email TEXT,
+        user_name TEXT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Comments table
+    CREATE TABLE IF NOT EXISTS comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER,
+        user_email TEXT,
+        user_name TEXT,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (post_id) REFERENCES posts (id)
+    );
+
+    -- Documents table
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        original_filename TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        uploaded_by_email TEXT,
+        uploaded_by_name TEXT,
+        upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Calendar events table
+    CREATE TABLE IF NOT EXISTS calendar_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        start_date DATE NOT NULL,
+        end_date DATE,
+        start_time TIME,
+        end_time TIME,
+        location TEXT,
+        responsible_user_email TEXT,
+        responsible_user_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tasks/Issues table
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'todo',
+        priority TEXT DEFAULT 'medium',
+        department TEXT,
+        assigned_to_email TEXT,
+        assigned_to_name TEXT,
+        created_by_email TEXT,
+        created_by_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Newsletter table
+    CREATE TABLE IF NOT EXISTS newsletters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        sent_date TIMESTAMP,
+        created_by_email TEXT,
+        created_by_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Suppliers table
+    CREATE TABLE IF NOT EXISTS suppliers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        username TEXT,
+        password TEXT,
+        website TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+
+# Database initialization
+def init_db():
+    """
+    Initialize database with required tables.
+
+    The schema is only applied when PRAGMA user_version is behind
+    SCHEMA_VERSION, so a warm start skips straight to the supplier seed.
+    """
+    conn = sqlite3.connect('database.db', isolation_level=None)
+    cursor = conn.cursor()
+
+    # WAL mode is stored in the database file, so one call here covers
+    # every connection opened later
+    cursor.execute('PRAGMA journal_mode=WAL')
+
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] < SCHEMA_VERSION:
+        # Apply the whole schema in one transaction
+        cursor.executescript('BEGIN IMMEDIATE;' + SCHEMA_SQL)
+
+        # Sort keys for the tasks page as generated columns, so the ordering
+        # can be served by an index instead of sorting CASE expressions
+        cursor.execute("PRAGMA table_xinfo(tasks)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'status_rank' not in columns:
+            cursor.execute('''
+                ALTER TABLE tasks ADD COLUMN status_rank INTEGER GENERATED ALWAYS AS (
+                    CASE status WHEN 'todo' THEN 1 WHEN 'in_progress' THEN 2 WHEN 'completed' THEN 3 END
+                ) VIRTUAL
+            ''')
+        if 'priority_rank' not in columns:
+            cursor.execute('''
+                ALTER TABLE tasks ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS (
+                    CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END
+                ) VIRTUAL
+            ''')
+
+        # Indexes for the WHERE / ORDER BY columns used by the list views
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_folder_date ON documents(folder, upload_date DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_start ON calendar_events(start_date, start_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_newsletters_sent ON newsletters(sent_date DESC) WHERE sent_date IS NOT NULL')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_post ON comments(post_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_sort ON tasks(status_rank, priority_rank, created_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at DESC)')
+
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        cursor.execute('COMMIT')
+
+        # Refresh planner statistics so the new indexes get picked
+        cursor.execute('ANALYZE')
+
+    # Seed default suppliers in a separate transaction
+    cursor.execute('BEGIN IMMEDIATE')
     cursor.execute('SELECT COUNT(*) FROM suppliers')
     if cursor.fetchone()[0] == 0:
         suppliers_data = [
@@ -392,18 +704,28 @@ def init_db():
             INSERT INTO suppliers (name, username, password, website)
             VALUES (?, ?, ?, ?)
         ''', suppliers_data)
-
-    conn.commit()
+    cursor.execute('COMMIT')
     conn.close()
 
 
+def warm_up():
+    """
+    Do the one-time startup work before the first request: create the
+    schema and build the MSAL client, which fetches the authority metadata.
+    Run in a preloading server master, the results are shared by every
+    forked worker.
+    """
+    init_db()
+    auth_manager._ensure_initialized()
+
+
 # Authentication Routes
 @app.route('/auth/login')
 def auth_login():
     """Initiate Microsoft Entra ID login flow."""
     try:
         auth_url, state = auth_manager.get_auth_url()
-        return redirect(auth_url)
+        return redirect(auth_url, code=303)
     except Exception as e:
         return jsonify({'error': 'Failed to initiate login', 'details': str(e)}), 500
 
@@ -466,6 +788,7 @@ def auth_logout():
 
 
 @app.route('/api/me')
+@api_auth_required
 def api_me():
     """Get current user information."""
     try:
@@ -500,6 +823,107 @@ def api_health():
     })
 
 
+# Dashboard queries
+_SQL_DASHBOARD_NEWS_ADMIN = '''
+    SELECT 'n' AS k, n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
+    FROM newsletters n
+    ORDER BY n.created_at DESC
+    LIMIT 10
+'''
+
+_SQL_DASHBOARD_NEWS_USER = '''
+    SELECT 'n' AS k, n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
+    FROM newsletters n
+    WHERE n.sent_date IS NOT NULL
+    ORDER BY n.sent_date DESC
+    LIMIT 10
+'''
+
+# Tasks are padded with NULL so all dashboard branches have the same width
+_SQL_DASHBOARD_TASKS = '''
+    SELECT 't', t.id, t.title, t.status, t.priority, t.assigned_to_name, NULL
+    FROM tasks t
+    WHERE t.status != 'completed'
+    ORDER BY t.created_at DESC
+    LIMIT 5
+'''
+
+_SQL_DASHBOARD_EVENTS = '''
+    SELECT 'e', c.id, c.title, c.start_date, c.start_time, c.location, c.responsible_user_name
+    FROM calendar_events c
+    WHERE c.start_date >= date('now')
+    ORDER BY c.start_date, c.start_time
+    LIMIT 5
+'''
+
+# Dashboard widgets in one query; each row is tagged with its source in
+# the first column
+_SQL_DASHBOARD = '''
+    SELECT * FROM ({news})
+    UNION ALL
+    SELECT * FROM ({tasks})
+    UNION ALL
+    SELECT * FROM ({events})
+'''
+_SQL_DASHBOARD_ADMIN = _SQL_DASHBOARD.format(
+    news=_SQL_DASHBOARD_NEWS_ADMIN, tasks=_SQL_DASHBOARD_TASKS, events=_SQL_DASHBOARD_EVENTS)
+_SQL_DASHBOARD_USER = _SQL_DASHBOARD.format(
+    news=_SQL_DASHBOARD_NEWS_USER, tasks=_SQL_DASHBOARD_TASKS, events=_SQL_DASHBOARD_EVENTS)
+
+# Column names per dashboard source; the UNION result only carries the
+# names of its first branch
+_DASHBOARD_COLUMNS = {
+    'n': ('id', 'title', 'content', 'sent_date', 'created_at', 'created_by_name'),
+    't': ('id', 'title', 'status', 'priority', 'assigned_to_name'),
+    'e': ('id', 'title', 'start_date', 'start_time', 'location', 'responsible_user_name'),
+}
+
+
+# List and lookup queries, kept as constants so the per-connection
+# statement cache reuses their prepared statements
+_SQL_DOCUMENTS_LIST = '''
+    SELECT d.id, d.original_filename, d.filename, d.upload_date, d.uploaded_by_name
+    FROM documents d
+    WHERE d.folder = ?
+    ORDER BY d.upload_date DESC
+'''
+
+_SQL_DOCUMENT_LOOKUP = 'SELECT filename, original_filename, folder FROM documents WHERE id = ?'
+
+_SQL_CALENDAR = '''
+    SELECT c.id, c.title, c.description, c.start_date, c.end_date,
+           c.start_time, c.end_time, c.location, c.responsible_user_name
+    FROM calendar_events c
+    ORDER BY c.start_date, c.start_time
+'''
+
+_SQL_TASKS_LIST = '''
+    SELECT t.id, t.title, t.description, t.status, t.priority, t.department,
+           t.created_at, t.created_by_name, t.assigned_to_name
+    FROM tasks t
+    ORDER BY t.status_rank, t.priority_rank, t.created_at DESC
+'''
+
+_SQL_NEWSLETTERS = '''
+    SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
+    FROM newsletters n
+    ORDER BY n.created_at DESC
+'''
+
+_SQL_SUPPLIERS = '''
+    SELECT id, name, username, password, website
+    FROM suppliers
+    ORDER BY name ASC
+'''
+
+_SQL_DELETE_SUPPLIER = 'DELETE FROM suppliers WHERE id = ?'
+
+_SQL_INSERT_POST = '''
+    INSERT INTO posts (user_email, user_name, title, content)
+    VALUES (?, ?, ?, ?)
+'''
+
+
 # Main Application Routes
 @app.route('/')
 def home():
@@ -516,48 +940,21 @@ def dashboard():
     """Main dashboard page."""
     user = get_current_user()
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    # Get recent newsletters (only sent ones for regular users, all for admin)
+    # Newsletters (only sent ones for regular users, all for admin), open
+    # tasks and upcoming events, fetched in one round-trip
     if user.get('is_admin', False):
-        cursor.execute('''
-            SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
-            FROM newsletters n
-            ORDER BY n.created_at DESC
-            LIMIT 10
-        ''')
+        cursor.execute(_SQL_DASHBOARD_ADMIN)
     else:
-        cursor.execute('''
-            SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
-            FROM newsletters n
-            WHERE n.sent_date IS NOT NULL
-            ORDER BY n.sent_date DESC
-            LIMIT 10
-        ''')
-    newsletters = cursor.fetchall()
+        cursor.execute(_SQL_DASHBOARD_USER)
 
-    # Get recent tasks
-    cursor.execute('''
-        SELECT t.id, t.title, t.status, t.priority, t.assigned_to_name
-        FROM tasks t
-        WHERE t.status != 'completed'
-        ORDER BY t.created_at DESC
-        LIMIT 5
-    ''')
-    tasks = cursor.fetchall()
-
-    # Get upcoming calendar events
-    cursor.execute('''
-        SELECT c.id, c.title, c.start_date, c.start_time, c.location, c.responsible_user_name
-        FROM calendar_events c
-        WHERE c.start_date >= date('now')
-        ORDER BY c.start_date, c.start_time
-        LIMIT 5
-    ''')
-    events = cursor.fetchall()
-
-    conn.close()
+    newsletters, tasks, events = [], [], []
+    buckets = {'n': newsletters, 't': tasks, 'e': events}
+    for row in cursor.fetchall():
+        source = row[0]
+        buckets[source].append(dict(zip(_DASHBOARD_COLUMNS[source], row[1:])))
 
     return render_template('dashboard.html', user=user, newsletters=newsletters, tasks=tasks, events=events)
 
@@ -568,32 +965,48 @@ def dashboard():
 def documents(folder=None):
     """Documents page."""
     user = get_current_user()
-    allowed_folders = ['salg', 'verksted', 'hms', 'it']
 
-    if folder and folder not in allowed_folders:
+    if folder and folder not in ALLOWED_FOLDERS:
         flash('Ugyldig mappe')
         return redirect(url_for('documents'))
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
     if folder:
-        cursor.execute('''
-            SELECT d.id, d.original_filename, d.filename, d.upload_date, d.uploaded_by_name
-            FROM documents d
-            WHERE d.folder = ?
-            ORDER BY d.upload_date DESC
-        ''', (folder,))
+        cursor.execute(_SQL_DOCUMENTS_LIST, (folder,))
         documents_list = cursor.fetchall()
     else:
         documents_list = []
 
-    conn.close()
-
     return render_template('documents.html', user=user,
                          current_folder=folder,
                          documents=documents_list,
-                         folders=allowed_folders)
+                         folders=UPLOAD_SUBDIRS)
+
+
+def _finalize_upload(tmp_path, folder, unique_filename, filename, uploader_email, uploader_name):
+    """
+    Move an uploaded temp file into its folder and record it in the database.
+
+    Returns True on success. On failure neither the temp file nor the moved
+    file is left behind.
+    """
+    final_path = os.path.join(app.config['UPLOAD_FOLDER'], folder, unique_filename)
+    try:
+        os.replace(tmp_path, final_path)
+        with db_writer() as conn:
+            conn.execute('''
+                INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (unique_filename, filename, folder, uploader_email, uploader_name))
+        return True
+    except Exception:
+        app.logger.exception('Failed to finalize upload %s', unique_filename)
+        for path in (tmp_path, final_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
 
 
 @app.route('/upload_document', methods=['POST'])
@@ -613,47 +1026,89 @@ def upload_document():
         flash('Vennligst velg fil og mappe')
         return redirect(request.referrer)
 
-    if folder not in ['salg', 'verksted', 'hms', 'it']:
+    if folder not in ALLOWED_FOLDERS:
         flash('Ugyldig mappe')
         return redirect(request.referrer)
 
     if file:
         filename = secure_filename(file.filename)
-        unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], folder, unique_filename)
-        file.save(file_path)
+        # Millisecond timestamp plus random suffix: unique even for uploads in the same second
+        unique_filename = f"{int(time.time() * 1000):x}_{secrets.token_hex(4)}_{filename}"
+
+        # Stream the upload into a temp file next to its destination, so a
+        # half-written file never appears under its final name
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(app.config['UPLOAD_FOLDER'], folder), suffix='.part')
+        with os.fdopen(fd, 'wb') as tmp:
+            shutil.copyfileobj(file.stream, tmp, 1 << 20)
+
+        if _finalize_upload(tmp_path, folder, unique_filename, filename,
+                            user.get('mail'), user.get('displayName')):
+            flash(f'Fil "{filename}" lastet opp til {folder.title()}')
+        else:
+            flash(f'Kunne ikke laste opp "{filename}"')
 
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (unique_filename, filename, folder, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+    return redirect(url_for('documents', folder=folder))
 
-        flash(f'Fil "{filename}" lastet opp til {folder.title()}')
 
-    return redirect(url_for('documents', folder=folder))
+@lru_cache(maxsize=4096)
+def _lookup_document(doc_id):
+    """
+    Get (folder, filename, original_filename) for a document.
+
+    Documents never change after upload, so lookups are cached in-process.
+    A missing document raises LookupError, which keeps misses out of the
+    cache so a later upload with that id is still found.
+    """
+    doc = get_db().execute(_SQL_DOCUMENT_LOOKUP, (doc_id,)).fetchone()
+    if doc is None:
+        raise LookupError(doc_id)
+    return doc['folder'], doc['filename'], doc['original_filename']
+
+
+def _attachment_options(download_name):
+    """
+    Content-Disposition parameters for an attachment, encoded like send_file:
+    non-ASCII names get an ASCII fallback plus an RFC 5987 filename*.
+    """
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+    return {'filename': download_name}
 
 
 @app.route('/download/<int:doc_id>')
 @auth_required
 def download_document(doc_id):
     """Download document."""
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT filename, original_filename, folder FROM documents WHERE id = ?', (doc_id,))
-    doc = cursor.fetchone()
-    conn.close()
-
-    if doc:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], doc[2])
-        return send_from_directory(file_path, doc[0], as_attachment=True, download_name=doc[1])
-    else:
+    try:
+        folder, filename, original_filename = _lookup_document(doc_id)
+    except LookupError:
         flash('Fil ikke funnet')
         return redirect(url_for('documents'))
 
+    accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        response = Response()
+        response.headers['X-Accel-Redirect'] = quote(f"{accel_prefix.rstrip('/')}/{folder}/{filename}")
+        # Headers.set quotes the parameters (e.g. a '"' in the name)
+        response.headers.set('Content-Disposition', 'attachment',
+                             **_attachment_options(original_filename))
+        # Let nginx pick the Content-Type from the file extension
+        del response.headers['Content-Type']
+        return response
+
+    # conditional=True enables Range and If-Modified-Since handling
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], folder)
+    response = send_from_directory(file_path, filename, as_attachment=True,
+                                   download_name=original_filename,
+                                   conditional=True, max_age=3600)
+    # Documents require login, so only the user's browser may cache them
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 
 @app.route('/calendar')
 @auth_required
@@ -661,18 +1116,12 @@ def calendar():
     """Calendar page."""
     user = get_current_user()
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT c.id, c.title, c.description, c.start_date, c.end_date,
-               c.start_time, c.end_time, c.location, c.responsible_user_name
-        FROM calendar_events c
-        ORDER BY c.start_date, c.start_time
-    ''')
-    events = cursor.fetchall()
-
-    conn.close()
+    cursor.execute(_SQL_CALENDAR)
+    # Dicts, because the template also serializes the events with |tojson
+    events = [dict(row) for row in cursor.fetchall()]
 
     return render_template('calendar.html', user=user, events=events)
 
@@ -692,15 +1141,12 @@ def create_event():
     location = request.form.get('location')
 
     if title and start_date:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO calendar_events
-            (title, description, start_date, end_date, start_time, end_time, location, responsible_user_email, responsible_user_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (title, description, start_date, end_date, start_time, end_time, location, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('''
+                INSERT INTO calendar_events
+                (title, description, start_date, end_date, start_time, end_time, location, responsible_user_email, responsible_user_name)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (title, description, start_date, end_date, start_time, end_time, location, user.get('mail'), user.get('displayName')))
 
         flash('Hendelse opprettet!')
     else:
@@ -715,29 +1161,12 @@ def tasks():
     """Tasks page."""
     user = get_current_user()
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT t.id, t.title, t.description, t.status, t.priority, t.department,
-               t.created_at, t.created_by_name, t.assigned_to_name
-        FROM tasks t
-        ORDER BY
-            CASE t.status
-                WHEN 'todo' THEN 1
-                WHEN 'in_progress' THEN 2
-                WHEN 'completed' THEN 3
-            END,
-            CASE t.priority
-                WHEN 'high' THEN 1
-                WHEN 'medium' THEN 2
-                WHEN 'low' THEN 3
-            END,
-            t.created_at DESC
-    ''')
-    tasks_list = cursor.fetchall()
-
-    conn.close()
+    cursor.execute(_SQL_TASKS_LIST)
+    # Dicts, because the template also serializes the tasks with |tojson
+    tasks_list = [dict(row) for row in cursor.fetchall()]
 
     return render_template('tasks.html', user=user, tasks=tasks_list)
 
@@ -755,14 +1184,11 @@ def create_task():
     assigned_to = request.form.get('assigned_to')
 
     if title:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO tasks (title, description, priority, department, assigned_to_name, created_by_email, created_by_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (title, description, priority, department, assigned_to or None, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('''
+                INSERT INTO tasks (title, description, priority, department, assigned_to_name, created_by_email, created_by_name)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (title, description, priority, department, assigned_to or None, user.get('mail'), user.get('displayName')))
 
         flash('Oppgave opprettet!')
     else:
@@ -779,12 +1205,9 @@ def update_task_status():
     new_status = request.form.get('status')
 
     if task_id and new_status in ['todo', 'in_progress', 'completed']:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                      (new_status, task_id))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                          (new_status, task_id))
 
         flash('Oppgavestatus oppdatert!')
     else:
@@ -799,18 +1222,12 @@ def newsletter():
     """Newsletter page."""
     user = get_current_user()
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT n.id, n.title, n.content, n.sent_date, n.created_at, n.created_by_name
-        FROM newsletters n
-        ORDER BY n.created_at DESC
-    ''')
+    cursor.execute(_SQL_NEWSLETTERS)
     newsletters = cursor.fetchall()
 
-    conn.close()
-
     return render_template('newsletter.html', user=user, newsletters=newsletters)
 
 
@@ -824,14 +1241,11 @@ def create_newsletter():
     content = request.form.get('content')
 
     if title and content:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO newsletters (title, content, created_by_email, created_by_name)
-            VALUES (?, ?, ?, ?)
-        ''', (title, content, user.get('mail'), user.get('displayName')))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('''
+                INSERT INTO newsletters (title, content, created_by_email, created_by_name)
+                VALUES (?, ?, ?, ?)
+            ''', (title, content, user.get('mail'), user.get('displayName')))
 
         flash('Nyhetsbrev opprettet!')
     else:
@@ -844,11 +1258,8 @@ def create_newsletter():
 @admin_required
 def send_newsletter(newsletter_id):
     """Send newsletter."""
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
-    cursor.execute('UPDATE newsletters SET sent_date = CURRENT_TIMESTAMP WHERE id = ?', (newsletter_id,))
-    conn.commit()
-    conn.close()
+    with db_writer() as conn:
+        conn.execute('UPDATE newsletters SET sent_date = CURRENT_TIMESTAMP WHERE id = ?', (newsletter_id,))
 
     flash('Nyhetsbrev sendt! (Simulert - e-postintegrasjon må implementeres)')
     return redirect(url_for('newsletter'))
@@ -860,18 +1271,12 @@ def suppliers():
     """Suppliers page."""
     user = get_current_user()
 
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT id, name, username, password, website
-        FROM suppliers
-        ORDER BY name ASC
-    ''')
+    cursor.execute(_SQL_SUPPLIERS)
     suppliers_list = cursor.fetchall()
 
-    conn.close()
-
     return render_template('suppliers.html', user=user, suppliers=suppliers_list)
 
 
@@ -885,14 +1290,11 @@ def add_supplier():
     website = request.form.get('website')
 
     if name:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO suppliers (name, username, password, website)
-            VALUES (?, ?, ?, ?)
-        ''', (name, username, password, website))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('''
+                INSERT INTO suppliers (name, username, password, website)
+                VALUES (?, ?, ?, ?)
+            ''', (name, username, password, website))
 
         flash('Leverandør lagt til!')
     else:
@@ -912,15 +1314,12 @@ def update_supplier():
     website = request.form.get('website')
 
     if supplier_id and name:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE suppliers
-            SET name = ?, username = ?, password = ?, website = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (name, username, password, website, supplier_id))
-        conn.commit()
-        conn.close()
+        with db_writer() as conn:
+            conn.execute('''
+                UPDATE suppliers
+                SET name = ?, username = ?, password = ?, website = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (name, username, password, website, supplier_id))
 
         flash('Leverandør oppdatert!')
     else:
@@ -933,11 +1332,8 @@ def update_supplier():
 @auth_required
 def delete_supplier(supplier_id):
     """Delete supplier."""
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM suppliers WHERE id = ?', (supplier_id,))
-    conn.commit()
-    conn.close()
+    with db_writer() as conn:
+        conn.execute(_SQL_DELETE_SUPPLIER, (supplier_id,))
 
     flash('Leverandør slettet!')
     return redirect(url_for('suppliers'))
@@ -949,18 +1345,15 @@ def create_post():
     """Create dashboard post."""
     user = get_current_user()
 
-    title = request.form.get('title')
-    content = request.form.get('content')
+    # The form may repeat title/content pairs to publish several posts at once
+    titles = request.form.getlist('title')
+    contents = request.form.getlist('content')
+    rows = [(user.get('mail'), user.get('displayName'), title, content)
+            for title, content in zip(titles, contents) if title and content]
 
-    if title and content:
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO posts (user_email, user_name, title, content)
-            VALUES (?, ?, ?, ?)
-        ''', (user.get('mail'), user.get('displayName'), title, content))
-        conn.commit()
-        conn.close()
+    if rows:
+        with db_writer() as conn:
+            conn.executemany(_SQL_INSERT_POST, rows)
 
         flash('Innlegg publisert!')
     else:
@@ -970,10 +1363,24 @@ def create_post():
 
 
 # Error handlers
+@lru_cache(maxsize=1)
+def _anonymous_error_page():
+    """Render the logged-out base page once and reuse it for error responses."""
+    return render_template('base.html', user=None)
+
+
+def _error_page(user):
+    """Render the base page for an error response."""
+    # Only the anonymous page without pending flash messages is request-independent
+    if user or session.get('_flashes'):
+        return render_template('base.html', user=user)
+    return _anonymous_error_page()
+
+
 @app.errorhandler(401)
 def unauthorized(error):
     """Handle unauthorized access."""
-    return render_template('base.html', user=None), 401
+    return _error_page(None), 401
 
 
 @app.errorhandler(403)
@@ -986,15 +1393,13 @@ def forbidden(error):
 @app.errorhandler(404)
 def not_found(error):
     """Handle not found errors."""
-    user = get_current_user()
-    return render_template('base.html', user=user), 404
+    return _error_page(get_current_user()), 404
 
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle internal server errors."""
-    user = get_current_user()
-    return render_template('base.html', user=user), 500
+    return _error_page(get_current_user()), 500
 
 
 if __name__ == '__main__':
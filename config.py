@@ -1,54 +1,60 @@
 import os
 import logging
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 class Config:
-    """Base configuration"""
-    SECRET_KEY = os.environ.get('FLASK_SECRET_KEY')
-    if not SECRET_KEY:
-        raise ValueError("FLASK_SECRET_KEY must be set in environment variables")
-
-    # Database
-    DATABASE_PATH = os.environ.get('DATABASE_PATH', 'database.db')
-
-    # Microsoft Entra ID
-    MS_CLIENT_ID = os.environ.get('MS_CLIENT_ID')
-    MS_CLIENT_SECRET = os.environ.get('MS_CLIENT_SECRET')
-    MS_TENANT_ID = os.environ.get('MS_TENANT_ID')
-
-    # Application settings
-    BASE_URL = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
-    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+    """Base configuration, read from the environment once by from_env()"""
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 
     # Session config
-    SESSION_TYPE = os.environ.get('SESSION_TYPE', 'filesystem')
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
     SESSION_COOKIE_HTTPONLY = True
-    SESSION_KEY_PREFIX = os.environ.get('SESSION_KEY_PREFIX', 'intranet:')
-    SESSION_FILE_THRESHOLD = int(os.environ.get('SESSION_FILE_THRESHOLD', '500'))
-
-    # Admin users
-    ADMIN_UPNS = [upn.strip() for upn in os.environ.get('ADMIN_UPNS', '').split(',') if upn.strip()]
+    # Also how long the server-side store keeps an idle session
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
 
     # Microsoft Graph API scopes
     SCOPES = ["https://graph.microsoft.com/User.Read"]
 
-    @property
-    def AUTHORITY(self):
-        """Microsoft authority URL"""
-        if self.MS_TENANT_ID:
-            return f"https://login.microsoftonline.com/{self.MS_TENANT_ID}"
-        return None
-
-    @property
-    def REDIRECT_URI(self):
-        """Microsoft auth redirect URI"""
-        return f"{self.BASE_URL}/auth/callback"
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """Load the environment-dependent settings onto the class"""
+        cls.SECRET_KEY = environ.get('FLASK_SECRET_KEY')
+        if not cls.SECRET_KEY:
+            raise ValueError("FLASK_SECRET_KEY must be set in environment variables")
+
+        # Database
+        cls.DATABASE_PATH = environ.get('DATABASE_PATH', 'database.db')
+
+        # Microsoft Entra ID
+        cls.MS_CLIENT_ID = environ.get('MS_CLIENT_ID')
+        cls.MS_CLIENT_SECRET = environ.get('MS_CLIENT_SECRET')
+        cls.MS_TENANT_ID = environ.get('MS_TENANT_ID')
+        # Microsoft authority URL
+        cls.AUTHORITY = f"https://login.microsoftonline.com/{cls.MS_TENANT_ID}" if cls.MS_TENANT_ID else None
+
+        # Application settings
+        cls.BASE_URL = environ.get('APP_BASE_URL', 'http://localhost:5000')
+        # Microsoft auth redirect URI
+        cls.REDIRECT_URI = f"{cls.BASE_URL}/auth/callback"
+        # Microsoft logout URL, falling back to the app itself without a tenant
+        cls.LOGOUT_URL = (f"{cls.AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={cls.BASE_URL}"
+                          if cls.AUTHORITY else cls.BASE_URL)
+        cls.UPLOAD_FOLDER = environ.get('UPLOAD_FOLDER', 'uploads')
+
+        # Session config, defaulting to Redis whenever a Redis server is configured
+        cls.REDIS_URL = environ.get('REDIS_URL')
+        cls.SESSION_TYPE = environ.get('SESSION_TYPE', 'redis' if cls.REDIS_URL else 'filesystem')
+        cls.SESSION_KEY_PREFIX = environ.get('SESSION_KEY_PREFIX', 'intranet:')
+        cls.SESSION_FILE_THRESHOLD = int(environ.get('SESSION_FILE_THRESHOLD', '500'))
+
+        # Admin users, lowercased for membership checks
+        cls.ADMIN_UPNS = frozenset(upn for upn in (entry.strip().lower() for entry in environ.get('ADMIN_UPNS', '').split(',')) if upn)
+        return cls
 
     def __post_init__(self):
         logger.info(f"Config loaded: {self.__class__.__name__}")
@@ -87,6 +93,8 @@ class TestingConfig(Config):
         super().__init__()
         logger.info("Testing config loaded")
 
+Config.from_env()
+
 # Config mapping
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for the unified intranet application.
+
+Run with: gunicorn -c gunicorn_conf.py app_unified:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def when_ready(server):
+    """Warm up the app in the master, before any worker is forked."""
+    import app_unified
+
+    try:
+        app_unified.warm_up()
+    except ValueError as e:
+        server.log.warning(f"Authentication warm-up skipped: {e}")
+
+    # SQLite connections must not be carried across fork()
+    app_unified.close_db_pool()
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and MSAL client."""
+    import app_unified
+
+    app_unified.open_db_pool()
+    app_unified.auth_manager.reset_after_fork()
@@ -5,10 +5,9 @@ Provides authentication endpoints and user API for intranet application.
 from flask import Flask, request, redirect, url_for, jsonify, session
 from flask_session import Session
 import os
-import redis
-import secrets
 from config import Config
-from auth import auth_manager, login_required
+from auth import auth_manager, login_required, api_login_required
+from json_provider import init_json_provider
 
 
 def create_app():
@@ -19,14 +18,22 @@ def create_app():
         Flask: Configured Flask application
     """
     app = Flask(__name__)
+    # Serve every jsonify response (/api/me, /api/healthz, errors) through orjson
+    init_json_provider(app)
 
     # Load configuration
     app.config.from_object(Config)
 
     # Configure session management
     if Config.SESSION_TYPE == 'redis' and Config.REDIS_URL:
-        # Use Redis for session storage (recommended for production)
-        app.config['SESSION_REDIS'] = redis.from_url(Config.REDIS_URL)
+        # Only needed (and only imported) when sessions live in Redis
+        import redis
+
+        # Use Redis for session storage (recommended for production), sharing
+        # one connection pool across the worker's threads
+        pool = redis.ConnectionPool.from_url(Config.REDIS_URL, max_connections=64,
+                                             socket_keepalive=True)
+        app.config['SESSION_REDIS'] = redis.Redis(connection_pool=pool)
     else:
         # Use filesystem for session storage (development)
         app.config['SESSION_FILE_DIR'] = os.path.join(os.getcwd(), 'flask_session')
@@ -120,7 +127,7 @@ def auth_logout():
 
 # API Routes
 @app.route('/api/me')
-@login_required
+@api_login_required
 def api_me():
     """
     Get current user information.
@@ -150,19 +157,21 @@ def api_me():
         return jsonify({'error': 'Failed to get user info', 'details': str(e)}), 500
 
 
+_HEALTH_STATUS = {'status': 'ok', 'service': 'intranet-auth'}
+
+
 @app.route('/api/healthz')
 def api_health():
     """
     Health check endpoint.
 
+    Answers from process state only, without inspecting the caller's session,
+    since load balancers poll it constantly.
+
     Returns:
         JSON response indicating service health
     """
-    return jsonify({
-        'status': 'ok',
-        'service': 'intranet-auth',
-        'authenticated': auth_manager.is_authenticated()
-    })
+    return jsonify(_HEALTH_STATUS)
 
 
 # Error Handlers
@@ -191,13 +200,26 @@ def internal_error(error):
 
 
 # CORS headers for frontend integration
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': Config.BASE_URL,
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,PUT,POST,DELETE,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true',
+}
+
+
+@app.before_request
+def cors_preflight():
+    """Answer CORS preflight requests before routing and auth checks."""
+    if request.method == 'OPTIONS' and request.routing_exception is None:
+        # after_request() adds the CORS headers
+        return '', 204
+
+
 @app.after_request
 def after_request(response):
     """Add CORS headers to all responses."""
-    response.headers.add('Access-Control-Allow-Origin', Config.BASE_URL)
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    response.headers.update(_CORS_HEADERS)
     return response
 
 
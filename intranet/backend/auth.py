@@ -2,13 +2,66 @@
 Microsoft Entra ID authentication module using MSAL.
 Handles OAuth2 flow, token management, and user session management.
 """
-import uuid
+import json
+import secrets
+import threading
+import time
 import msal
 import requests
-from flask import session, request, url_for, redirect, jsonify
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import session, url_for, redirect, jsonify, g, current_app
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from config import Config
 
+# orjson is optional; fall back to the stdlib json module without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
+
+# Refresh access tokens once they have less than this many seconds left
+TOKEN_REFRESH_MARGIN = 300
+
+# (connect, read) timeouts for Graph and MSAL requests
+HTTP_TIMEOUT = (3.05, 15)
+
+# Start a background refresh once a token has less than this many seconds left
+TOKEN_PREFETCH_MARGIN = 360
+
+# Concurrent requests within this many seconds share one refresh result
+TOKEN_REFRESH_REUSE = 5
+
+# Session keys written by the login flow, removed again on logout
+AUTH_SESSION_KEYS = (
+    'access_token', 'id_token', 'user_id', 'user', 'is_admin', 'auth_state',
+    'token_expires_at', 'home_account_id', 'user_fetched_at', 'token_cache',
+)
+
+
+def _new_http_session():
+    """
+    Create the keep-alive session for Microsoft Graph and MSAL's token requests,
+    with bounded retries on connection errors, throttling and 5xx.
+    """
+    http = requests.Session()
+    # The session is shared by every user, so never store cookies from responses
+    http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    http.mount('https://', HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=3, connect=3, read=2, backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'})
+        )
+    ))
+    return http
+
 
 class AuthManager:
     """Manages Microsoft Entra ID authentication using MSAL."""
@@ -17,6 +70,39 @@ class AuthManager:
         """Initialize the authentication manager."""
         self.msal_app = None
         self._initialized = False
+        # Shared by every MSAL client so authority discovery is only fetched once
+        self._msal_http_cache = {}
+        # MSAL wants a list; build it once rather than on every call
+        self._scopes = list(Config.SCOPES)
+
+        # One refresh at a time per user; requests that queued behind it
+        # reuse its result instead of asking MSAL again. Locks are
+        # [lock, waiters] pairs, dropped once nobody holds or waits on them.
+        self._refresh_locks = {}
+        self._refresh_locks_guard = threading.Lock()
+        self._recent_refreshes = {}
+
+        # In-flight background refreshes, keyed by user, that store a new
+        # token cache ahead of expiry so refresh_token() becomes a cache hit.
+        # Each entry removes itself when it finishes.
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=2)
+        self._prefetches = {}
+
+        self._http = _new_http_session()
+
+    def reset_after_fork(self):
+        """
+        Drop the connections and MSAL client inherited from a forking parent.
+
+        Kept-alive TLS sockets must not be shared between processes. The
+        authority discovery in _msal_http_cache is kept, so rebuilding the
+        MSAL client in the worker needs no network round-trip.
+        """
+        self._http = _new_http_session()
+        self.msal_app = None
+        self._initialized = False
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=2)
+        self._prefetches = {}
 
     def _ensure_initialized(self):
         """Lazy initialization of MSAL client."""
@@ -26,15 +112,73 @@ class AuthManager:
                 Config.validate_config()
 
                 # Initialize MSAL confidential client
-                self.msal_app = msal.ConfidentialClientApplication(
-                    Config.CLIENT_ID,
-                    authority=Config.AUTHORITY,
-                    client_credential=Config.CLIENT_SECRET
-                )
+                self.msal_app = self._build_msal_app()
                 self._initialized = True
             except Exception as e:
                 raise ValueError(f"Authentication configuration error: {str(e)}")
 
+    def _build_msal_app(self, cache=None):
+        """Create an MSAL confidential client, optionally bound to a user's token cache."""
+        return msal.ConfidentialClientApplication(
+            Config.CLIENT_ID,
+            authority=Config.AUTHORITY,
+            client_credential=Config.CLIENT_SECRET,
+            token_cache=cache,
+            http_client=self._http,
+            http_cache=self._msal_http_cache,
+            timeout=HTTP_TIMEOUT
+        )
+
+    def _load_token_cache(self, user_id):
+        """
+        Load a user's MSAL token cache.
+
+        The cache is stored in Redis under msal:<oid> when Redis sessions are
+        configured, so every worker sees the same tokens, otherwise in the
+        user's session.
+        """
+        return self._deserialize_token_cache(self._read_token_cache(user_id))
+
+    def _read_token_cache(self, user_id):
+        """Read a user's serialized MSAL token cache from Redis or the session."""
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None:
+            return redis_client.get(f'msal:{user_id}')
+        return session.get('token_cache')
+
+    @staticmethod
+    def _deserialize_token_cache(data):
+        """Build an MSAL token cache from its serialized form (or an empty one)."""
+        cache = msal.SerializableTokenCache()
+        if data:
+            cache.deserialize(data)
+        return cache
+
+    def _save_token_cache(self, user_id, cache):
+        """Persist a user's MSAL token cache if MSAL changed it."""
+        if not cache.has_state_changed:
+            return
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None:
+            redis_client.set(f'msal:{user_id}', cache.serialize(),
+                             ex=int(Config.PERMANENT_SESSION_LIFETIME.total_seconds()))
+        else:
+            session['token_cache'] = cache.serialize()
+
+    def _find_account(self, msal_app, cache, home_account_id, username):
+        """
+        Find the user's MSAL account.
+
+        Looks the account up by home_account_id when it is known, falling
+        back to MSAL's username scan for sessions created before it was stored.
+        """
+        if home_account_id:
+            accounts = cache.find(msal.TokenCache.CredentialType.ACCOUNT,
+                                  query={'home_account_id': home_account_id})
+        else:
+            accounts = msal_app.get_accounts(username=username)
+        return accounts[0] if accounts else None
+
     def get_auth_url(self):
         """
         Generate the Microsoft login URL.
@@ -46,12 +190,12 @@ class AuthManager:
         self._ensure_initialized()
 
         # Generate a unique state parameter for CSRF protection
-        state = str(uuid.uuid4())
+        state = secrets.token_urlsafe(16)
         session['auth_state'] = state
 
         # Build authorization URL
         auth_url = self.msal_app.get_authorization_request_url(
-            scopes=list(Config.SCOPES),
+            scopes=self._scopes,
             state=state,
             redirect_uri=Config.REDIRECT_URI
         )
@@ -76,10 +220,12 @@ class AuthManager:
         if state != session.get('auth_state'):
             return None
 
-        # Exchange authorization code for access token
-        result = self.msal_app.acquire_token_by_authorization_code(
+        # Exchange authorization code for access token, keeping the tokens
+        # (including the refresh token) in a per-user cache
+        cache = msal.SerializableTokenCache()
+        result = self._build_msal_app(cache).acquire_token_by_authorization_code(
             auth_code,
-            scopes=list(Config.SCOPES),
+            scopes=self._scopes,
             redirect_uri=Config.REDIRECT_URI
         )
 
@@ -88,18 +234,23 @@ class AuthManager:
 
         # Store tokens in session
         session['access_token'] = result.get('access_token')
+        session['token_expires_at'] = time.time() + result.get('expires_in', 3600)
         session['id_token'] = result.get('id_token')
         session['user_id'] = result.get('id_token_claims', {}).get('oid')
-
-        # Fetch user profile from Microsoft Graph
-        user_info = self.get_user_profile(result.get('access_token'))
+        # The fresh cache holds exactly this user's account; remember its key
+        # so refreshes can look it up directly
+        accounts = cache.find(msal.TokenCache.CredentialType.ACCOUNT)
+        session['home_account_id'] = accounts[0]['home_account_id'] if accounts else None
+        self._save_token_cache(session['user_id'], cache)
+
+        # Fetch user profile from Microsoft Graph, unless this user's is still cached
+        user_info = self.get_user_profile_cached(result.get('access_token'))
         if user_info:
-            # Store user information in session
-            session['user'] = user_info
-            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in [upn.lower() for upn in Config.ADMIN_UPNS]
+            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in Config.ADMIN_UPNS
 
         # Clear the auth state
         session.pop('auth_state', None)
+        g.pop('authenticated', None)
 
         return user_info
 
@@ -118,18 +269,39 @@ class AuthManager:
 
         # Microsoft Graph API endpoint for user profile
         graph_url = 'https://graph.microsoft.com/v1.0/me'
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        headers = {'Authorization': f'Bearer {access_token}'}
 
         try:
-            response = requests.get(graph_url, headers=headers, timeout=10)
+            response = self._http.get(graph_url, headers=headers, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException:
+            # Parse the raw bytes; orjson skips requests' text decode
+            return _json_loads(response.content)
+        except (requests.RequestException, ValueError):
             return None
 
+    def get_user_profile_cached(self, access_token=None, ttl=3600):
+        """
+        Get the user profile from the session, fetching it from Microsoft Graph
+        only when it is missing, older than ttl seconds or for another user.
+
+        Args:
+            access_token (str): Access token to use, defaults to the session's
+
+        Returns:
+            dict: User profile information
+        """
+        user_info = session.get('user')
+        if (user_info and user_info.get('id') == session.get('user_id')
+                and time.time() - session.get('user_fetched_at', 0) < ttl):
+            return user_info
+
+        user_info = self.get_user_profile(access_token or session.get('access_token'))
+        if user_info:
+            # Store user information in session
+            session['user'] = user_info
+            session['user_fetched_at'] = time.time()
+        return user_info
+
     def refresh_token(self):
         """
         Refresh the access token if needed.
@@ -137,7 +309,8 @@ class AuthManager:
         Returns:
             bool: True if token was refreshed successfully
         """
-        if 'user_id' not in session:
+        user_id = session.get('user_id')
+        if not user_id:
             return False
 
         # Ensure MSAL client is initialized
@@ -146,40 +319,147 @@ class AuthManager:
         except ValueError:
             return False
 
-        # Get account from cache
-        accounts = self.msal_app.get_accounts(username=session.get('user', {}).get('userPrincipalName'))
-        if not accounts:
-            return False
-
-        # Try to get token silently
-        result = self.msal_app.acquire_token_silent(
-            scopes=list(Config.SCOPES),
-            account=accounts[0]
-        )
+        with self._refresh_locks_guard:
+            entry = self._refresh_locks.setdefault(user_id, [threading.Lock(), 0])
+            entry[1] += 1
 
-        if 'access_token' in result:
+        try:
+            with entry[0]:
+                refreshed_at, result = self._recent_refreshes.get(user_id, (0, None))
+                if time.time() - refreshed_at >= TOKEN_REFRESH_REUSE:
+                    # Get account from the user's token cache
+                    cache = self._load_token_cache(user_id)
+                    msal_app = self._build_msal_app(cache)
+                    account = self._find_account(
+                        msal_app, cache, session.get('home_account_id'),
+                        session.get('user', {}).get('userPrincipalName')
+                    )
+                    if not account:
+                        return False
+
+                    # Try to get token silently
+                    result = msal_app.acquire_token_silent(
+                        scopes=self._scopes,
+                        account=account
+                    )
+                    self._save_token_cache(user_id, cache)
+                    self._remember_refresh(user_id, result)
+        finally:
+            with self._refresh_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._refresh_locks[user_id]
+
+        if result and 'access_token' in result:
             session['access_token'] = result['access_token']
+            session['token_expires_at'] = time.time() + result.get('expires_in', 3600)
             return True
 
         return False
 
+    def _remember_refresh(self, user_id, result):
+        """Store a refresh result for reuse, evicting results too old to reuse."""
+        now = time.time()
+        with self._refresh_locks_guard:
+            for uid, (refreshed_at, _) in list(self._recent_refreshes.items()):
+                if now - refreshed_at >= TOKEN_REFRESH_REUSE:
+                    del self._recent_refreshes[uid]
+            self._recent_refreshes[user_id] = (now, result)
+
+    def prefetch_token(self):
+        """
+        Refresh the access token in the background ahead of expiry.
+
+        A forced silent refresh runs on the prefetch executor and stores the
+        new token cache in Redis itself. Later requests copy the new token
+        into the session through refresh_token(), which then is a cache hit.
+        Only done with Redis: the background thread cannot write the session.
+        """
+        user_id = session.get('user_id')
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if not user_id or not self._initialized or redis_client is None:
+            return
+
+        with self._refresh_locks_guard:
+            if user_id in self._prefetches:
+                return
+
+        # Pick up the token of a finished background refresh, if any
+        self.refresh_token()
+        if session.get('token_expires_at', 0) - time.time() >= TOKEN_PREFETCH_MARGIN:
+            return
+
+        data = self._read_token_cache(user_id)
+        with self._refresh_locks_guard:
+            if user_id in self._prefetches:
+                return
+            future = self._prefetches[user_id] = self._prefetch_executor.submit(
+                self._refresh_in_background, redis_client, user_id, data,
+                session.get('home_account_id'),
+                session.get('user', {}).get('userPrincipalName')
+            )
+        future.add_done_callback(lambda done: self._prefetch_done(user_id, done))
+
+    def _prefetch_done(self, user_id, future):
+        """Forget a finished background refresh, and any result it made stale."""
+        with self._refresh_locks_guard:
+            if self._prefetches.get(user_id) is future:
+                del self._prefetches[user_id]
+            self._recent_refreshes.pop(user_id, None)
+
+    def _refresh_in_background(self, redis_client, user_id, data, home_account_id, username):
+        """
+        Force a silent refresh against a user's serialized token cache and
+        store the result, unless another worker stored a newer cache meanwhile.
+        """
+        cache = self._deserialize_token_cache(data)
+        msal_app = self._build_msal_app(cache)
+        account = self._find_account(msal_app, cache, home_account_id, username)
+        if not account:
+            return
+        msal_app.acquire_token_silent(self._scopes, account, force_refresh=True)
+        if not cache.has_state_changed:
+            return
+
+        key = f'msal:{user_id}'
+
+        def store_if_unchanged(pipe):
+            # transaction() WATCHes the key and calls this again if it is
+            # written before EXEC, so a newer cache is never overwritten
+            if pipe.get(key) != data:
+                return
+            pipe.multi()
+            pipe.set(key, cache.serialize(),
+                     ex=int(Config.PERMANENT_SESSION_LIFETIME.total_seconds()))
+
+        redis_client.transaction(store_if_unchanged, key)
+
     def logout(self):
         """Clear user session and return Microsoft logout URL."""
-        # Clear all session data
-        session.clear()
+        # Drop the user's shared token cache, then the auth data in the session
+        redis_client = current_app.config.get('SESSION_REDIS')
+        if redis_client is not None and session.get('user_id'):
+            redis_client.delete(f"msal:{session['user_id']}")
+        for key in AUTH_SESSION_KEYS:
+            session.pop(key, None)
+        g.pop('authenticated', None)
 
         # Return Microsoft logout URL
-        logout_url = f"{Config.AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={Config.BASE_URL}"
-        return logout_url
+        return Config.LOGOUT_URL
 
     def is_authenticated(self):
         """
         Check if the current user is authenticated.
 
+        The result is kept on flask.g for the rest of the request, since the
+        decorators, get_current_user() and the views all ask.
+
         Returns:
             bool: True if user is authenticated
         """
-        return 'user' in session and 'access_token' in session
+        if 'authenticated' not in g:
+            g.authenticated = 'user' in session and 'access_token' in session
+        return g.authenticated
 
     def get_current_user(self):
         """
@@ -189,7 +469,9 @@ class AuthManager:
             dict: Current user information or None
         """
         if self.is_authenticated():
-            user_data = session.get('user', {})
+            # Refetched from Graph once the cached profile is stale; keep
+            # serving the old one if that fails
+            user_data = self.get_user_profile_cached() or session.get('user', {})
             user_data['is_admin'] = session.get('is_admin', False)
             return user_data
         return None
@@ -199,29 +481,51 @@ class AuthManager:
 auth_manager = AuthManager()
 
 
+def _keep_token_fresh():
+    """Refresh the access token when it is close to expiring, starting in the background shortly before."""
+    remaining = session.get('token_expires_at', 0) - time.time()
+    if remaining < TOKEN_REFRESH_MARGIN:
+        auth_manager.refresh_token()
+    elif remaining < TOKEN_PREFETCH_MARGIN:
+        auth_manager.prefetch_token()
+
+
 def login_required(f):
     """
-    Decorator to require authentication for a route.
+    Decorator to require authentication for a web route.
 
     Args:
         f: Function to wrap
 
     Returns:
-        Wrapped function that checks authentication
+        Wrapped function that redirects to login when not authenticated
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not auth_manager.is_authenticated():
-            # For API routes, return JSON error
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
-
-            # For web routes, redirect to login
             return redirect(url_for('auth_login'))
 
-        # Try to refresh token if needed
-        auth_manager.refresh_token()
+        _keep_token_fresh()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def api_login_required(f):
+    """
+    Decorator to require authentication for an API route.
+
+    Args:
+        f: Function to wrap
+
+    Returns:
+        Wrapped function that returns a JSON 401 when not authenticated
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not auth_manager.is_authenticated():
+            return jsonify({'error': 'Authentication required'}), 401
 
+        _keep_token_fresh()
         return f(*args, **kwargs)
     return decorated_function
 
@@ -239,13 +543,9 @@ def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not auth_manager.is_authenticated():
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
             return redirect(url_for('auth_login'))
 
         if not session.get('is_admin', False):
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Admin privileges required'}), 403
             return jsonify({'error': 'Admin privileges required'}), 403
 
         return f(*args, **kwargs)
@@ -3,54 +3,71 @@ Configuration management for Microsoft Entra ID authentication.
 Handles environment variables and application settings.
 """
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 class Config:
-    """Application configuration class."""
+    """
+    Application configuration class.
 
-    # Flask configuration - ensure SECRET_KEY is always a string
-    SECRET_KEY = str(os.environ.get('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production'))
+    Environment-dependent settings are read once by from_env() when this
+    module is imported. Call it again to pick up a changed environment.
+    """
 
-    # Microsoft Entra ID configuration
-    CLIENT_ID = os.environ.get('MS_CLIENT_ID')
-    CLIENT_SECRET = os.environ.get('MS_CLIENT_SECRET')
-    TENANT_ID = os.environ.get('MS_TENANT_ID')
-
-    # Application configuration
-    BASE_URL = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
-    REDIRECT_URI = f"{BASE_URL}/auth/callback"
-
-    # Admin users (comma-separated UPNs)
-    ADMIN_UPNS = [upn.strip() for upn in os.environ.get('ADMIN_UPNS', '').split(',') if upn.strip()]
-
-    # Session configuration - ensure all values are proper types
-    SESSION_TYPE = str(os.environ.get('SESSION_TYPE', 'filesystem'))
+    # Session configuration that doesn't depend on the environment
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
-    SESSION_KEY_PREFIX = str(os.environ.get('SESSION_KEY_PREFIX', 'intranet:'))
-    SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
     SESSION_COOKIE_HTTPONLY = True
-    SESSION_COOKIE_SAMESITE = str(os.environ.get('SESSION_COOKIE_SAMESITE', 'Lax'))
-    SESSION_COOKIE_NAME = str(os.environ.get('SESSION_COOKIE_NAME', 'session'))
-    SESSION_COOKIE_DOMAIN = os.environ.get('SESSION_COOKIE_DOMAIN')  # None for localhost
-    SESSION_COOKIE_PATH = str(os.environ.get('SESSION_COOKIE_PATH', '/'))
-    SESSION_FILE_THRESHOLD = int(os.environ.get('SESSION_FILE_THRESHOLD', 500))
-
-    # Redis configuration (optional)
-    REDIS_URL = os.environ.get('REDIS_URL')
-    if SESSION_TYPE == 'redis' and REDIS_URL:
-        SESSION_REDIS = REDIS_URL
+    # Also how long the server-side store keeps an idle session
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
 
     # Microsoft Graph API scopes
-    SCOPES = [
-        "https://graph.microsoft.com/User.Read"
-    ]
+    SCOPES = (
+        "https://graph.microsoft.com/User.Read",
+    )
 
-    # Microsoft endpoints
-    AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """Load the environment-dependent settings onto the class."""
+        # Flask configuration - ensure SECRET_KEY is always a string
+        cls.SECRET_KEY = str(environ.get('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production'))
+
+        # Microsoft Entra ID configuration
+        cls.CLIENT_ID = environ.get('MS_CLIENT_ID')
+        cls.CLIENT_SECRET = environ.get('MS_CLIENT_SECRET')
+        cls.TENANT_ID = environ.get('MS_TENANT_ID')
+
+        # Application configuration
+        cls.BASE_URL = environ.get('APP_BASE_URL', 'http://localhost:5000')
+        cls.REDIRECT_URI = f"{cls.BASE_URL}/auth/callback"
+
+        # Admin users (comma-separated UPNs), lowercased for membership checks
+        cls.ADMIN_UPNS = frozenset(upn for upn in (entry.strip().lower() for entry in environ.get('ADMIN_UPNS', '').split(',')) if upn)
+
+        # Redis configuration (optional)
+        cls.REDIS_URL = environ.get('REDIS_URL')
+
+        # Session configuration - ensure all values are proper types.
+        # Sessions default to Redis whenever a Redis server is configured.
+        cls.SESSION_TYPE = str(environ.get('SESSION_TYPE', 'redis' if cls.REDIS_URL else 'filesystem'))
+        cls.SESSION_KEY_PREFIX = str(environ.get('SESSION_KEY_PREFIX', 'intranet:'))
+        cls.SESSION_COOKIE_SECURE = environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
+        cls.SESSION_COOKIE_SAMESITE = str(environ.get('SESSION_COOKIE_SAMESITE', 'Lax'))
+        cls.SESSION_COOKIE_NAME = str(environ.get('SESSION_COOKIE_NAME', 'session'))
+        cls.SESSION_COOKIE_DOMAIN = environ.get('SESSION_COOKIE_DOMAIN')  # None for localhost
+        cls.SESSION_COOKIE_PATH = str(environ.get('SESSION_COOKIE_PATH', '/'))
+        cls.SESSION_FILE_THRESHOLD = int(environ.get('SESSION_FILE_THRESHOLD', 500))
+
+        if cls.SESSION_TYPE == 'redis' and cls.REDIS_URL:
+            cls.SESSION_REDIS = cls.REDIS_URL
+
+        # Microsoft endpoints
+        cls.AUTHORITY = f"https://login.microsoftonline.com/{cls.TENANT_ID}"
+        cls.LOGOUT_URL = f"{cls.AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={cls.BASE_URL}"
+        return cls
 
     @classmethod
     def validate_config(cls):
@@ -76,4 +93,7 @@ class Config:
         if len(cls.SECRET_KEY) < 32:
             raise ValueError("FLASK_SECRET_KEY should be at least 32 characters long")
 
-        return True
\ No newline at end of file
+        return True
+
+
+Config.from_env()
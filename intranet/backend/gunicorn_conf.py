@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for the intranet authentication service.
+
+Run with: gunicorn -c gunicorn_conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# Threads let the blocking MSAL and Graph round-trips of one worker overlap
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def when_ready(server):
+    """Fetch the authority metadata in the master, before any worker is forked."""
+    from auth import auth_manager
+
+    try:
+        auth_manager._ensure_initialized()
+    except ValueError as e:
+        server.log.warning(f"Authentication warm-up skipped: {e}")
+
+
+def post_fork(server, worker):
+    """Give each worker its own HTTP connections and MSAL client."""
+    from auth import auth_manager
+
+    auth_manager.reset_after_fork()
@@ -0,0 +1,39 @@
+"""
+orjson-backed Flask JSON provider.
+
+Copy of the json_provider.py in the repository root, because the backend
+is deployed on its own; keep the two files in sync.
+"""
+from flask.json.provider import JSONProvider
+
+# orjson is optional; without it apps keep Flask's default provider
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_default(obj):
+    """Serialize objects orjson does not know natively (e.g. Markup)."""
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used for jsonify and |tojson."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys'):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_orjson_default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def init_json_provider(app):
+    """Serve jsonify and |tojson through orjson when it is installed."""
+    if orjson:
+        app.json = OrjsonProvider(app)
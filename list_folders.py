@@ -1,9 +1,19 @@
+import io
 import os
+import sys
 import msal
 import requests
 import json
 from dotenv import load_dotenv
 
+# orjson is optional; fall back to the stdlib json module without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
+
 # Load environment variables
 load_dotenv()
 
@@ -47,40 +57,53 @@ headers = {"Authorization": f"Bearer {result['access_token']}"}
 
 print("📁 Fetching mail folders...")
 url = "https://graph.microsoft.com/v1.0/me/mailFolders?$expand=childFolders"
-resp = requests.get(url, headers=headers)
-
-if resp.status_code != 200:
-    print(f"❌ API request failed: {resp.status_code}")
-    print(f"Response: {resp.text}")
-    exit(1)
 
-data = resp.json()
-
-print("✅ Mail folders retrieved successfully")
-print("\n📂 Mail Folders:")
-print("=" * 60)
-
-def print_folder(folder, indent=0):
-    """Print folder information with proper indentation."""
-    prefix = "  " * indent
-    display_name = folder.get('displayName', 'Unknown')
-    folder_id = folder.get('id', 'No ID')
-
-    print(f"{prefix}📁 {display_name}")
-    print(f"{prefix}   ID: {folder_id}")
-
-    # Print child folders if they exist
-    child_folders = folder.get('childFolders', [])
-    if child_folders:
-        for child in child_folders:
-            print_folder(child, indent + 1)
-
-# Print all folders
-if 'value' in data:
-    for folder in data['value']:
-        print_folder(folder)
-        print()  # Empty line between top-level folders
-else:
-    print("❌ No folders found in response")
-    print("Raw response:")
-    print(json.dumps(data, indent=2, ensure_ascii=False))
\ No newline at end of file
+def print_folders(folders):
+    """Print a page of folder trees with proper indentation, in a single write."""
+    out = io.StringIO()
+    for top_folder in folders:
+        # Walk the tree depth-first with an explicit stack, children in order
+        stack = [(top_folder, 0)]
+        while stack:
+            folder, indent = stack.pop()
+            prefix = "  " * indent
+            display_name = folder.get('displayName', 'Unknown')
+            folder_id = folder.get('id', 'No ID')
+
+            out.write(f"{prefix}📁 {display_name}\n")
+            out.write(f"{prefix}   ID: {folder_id}\n")
+
+            stack.extend((child, indent + 1) for child in reversed(folder.get('childFolders', [])))
+        out.write("\n")  # Empty line between top-level folders
+    sys.stdout.write(out.getvalue())
+
+# Graph returns the folders a page at a time; print each page as it arrives
+# and follow @odata.nextLink until there are no more
+http = requests.Session()
+http.headers.update(headers)
+first_page = True
+while url:
+    resp = http.get(url)
+
+    if resp.status_code != 200:
+        print(f"❌ API request failed: {resp.status_code}")
+        print(f"Response: {resp.text}")
+        exit(1)
+
+    data = _json_loads(resp.content)
+
+    if first_page:
+        print("✅ Mail folders retrieved successfully")
+        print("\n📂 Mail Folders:")
+        print("=" * 60)
+        first_page = False
+
+    # Print all folders on this page
+    if 'value' in data:
+        print_folders(data['value'])
+    else:
+        print("❌ No folders found in response")
+        print("Raw response:")
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+
+    url = data.get('@odata.nextLink')
@@ -2,15 +2,20 @@
 GRM Intranet Application with Microsoft Entra ID authentication.
 All-in-one Flask app with working blueprints and database integration.
 """
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session, g, current_app
 from flask_session import Session
 from werkzeug.utils import secure_filename
 import sqlite3
 import os
-import uuid
+import queue
+import time
+import secrets
 import msal
 import requests
-from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta
 import json
 from functools import wraps
 from dotenv import load_dotenv
@@ -33,9 +38,14 @@ class Config:
     TENANT_ID = os.environ.get('MS_TENANT_ID')
     BASE_URL = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
     REDIRECT_URI = f"{BASE_URL}/auth/callback"
-    ADMIN_UPNS = [upn.strip() for upn in os.environ.get('ADMIN_UPNS', '').split(',') if upn.strip()]
-    SESSION_TYPE = str(os.environ.get('SESSION_TYPE', 'filesystem'))
+    # Lowercased once here so admin checks are a single set lookup
+    ADMIN_UPNS = frozenset(upn for upn in (entry.strip().lower() for entry in os.environ.get('ADMIN_UPNS', '').split(',')) if upn)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    # Sessions default to Redis whenever a Redis server is configured
+    SESSION_TYPE = str(os.environ.get('SESSION_TYPE', 'redis' if REDIS_URL else 'filesystem'))
     SESSION_PERMANENT = False
+    # Also used by Flask-Session as the Redis key TTL
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
     SESSION_USE_SIGNER = True
     SESSION_KEY_PREFIX = str(os.environ.get('SESSION_KEY_PREFIX', 'intranet:'))
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -58,6 +68,20 @@ class Config:
         return True
 
 
+# Keep-alive session for Microsoft Graph, with retries on throttling and
+# transient server errors (urllib3 honours Retry-After on 429)
+_graph_session = requests.Session()
+# The session is shared by every user, so never store cookies from responses
+_graph_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_graph_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Seconds a fetched Graph /me profile is reused before asking Graph again
+PROFILE_CACHE_TTL = 300
+
 # Authentication Manager
 class AuthManager:
     """Manages Microsoft Entra ID authentication using MSAL."""
@@ -81,7 +105,7 @@ class AuthManager:
 
     def get_auth_url(self):
         self._ensure_initialized()
-        state = str(uuid.uuid4())
+        state = secrets.token_urlsafe(16)
         session['auth_state'] = state
         auth_url = self.msal_app.get_authorization_request_url(
             scopes=list(Config.SCOPES),
@@ -104,10 +128,9 @@ class AuthManager:
         session['access_token'] = result.get('access_token')
         session['id_token'] = result.get('id_token')
         session['user_id'] = result.get('id_token_claims', {}).get('oid')
-        user_info = self.get_user_profile(result.get('access_token'))
+        user_info = self.get_user_profile_cached(result.get('access_token'), session['user_id'])
         if user_info:
-            session['user'] = user_info
-            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in [upn.lower() for upn in Config.ADMIN_UPNS]
+            session['is_admin'] = user_info.get('userPrincipalName', '').lower() in Config.ADMIN_UPNS
         session.pop('auth_state', None)
         return user_info
 
@@ -115,14 +138,37 @@ class AuthManager:
         if not access_token:
             return None
         graph_url = 'https://graph.microsoft.com/v1.0/me'
-        headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
+        headers = {'Authorization': f'Bearer {access_token}'}
         try:
-            response = requests.get(graph_url, headers=headers, timeout=10)
+            response = _graph_session.get(graph_url, headers=headers, timeout=10)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException:
+        except (requests.RequestException, ValueError):
             return None
 
+    def get_user_profile_cached(self, access_token, oid):
+        """Get the /me profile from the session or Redis, calling Graph only after PROFILE_CACHE_TTL."""
+        user_info = session.get('user')
+        if (user_info and user_info.get('id') == oid
+                and time.time() - session.get('user_fetched_at', 0) < PROFILE_CACHE_TTL):
+            return user_info
+
+        # With Redis sessions the profile is shared by every worker and session
+        redis_client = current_app.config.get('SESSION_REDIS')
+        cache_key = f"{Config.SESSION_KEY_PREFIX}profile:{oid}"
+        cached = redis_client.get(cache_key) if redis_client is not None and oid else None
+        if cached:
+            user_info = json.loads(cached)
+        else:
+            user_info = self.get_user_profile(access_token)
+            if user_info and redis_client is not None and oid:
+                redis_client.setex(cache_key, PROFILE_CACHE_TTL, json.dumps(user_info))
+
+        if user_info:
+            session['user'] = user_info
+            session['user_fetched_at'] = time.time()
+        return user_info
+
     def logout(self):
         session.clear()
         return f"{Config.AUTHORITY}/oauth2/v2.0/logout?post_logout_redirect_uri={Config.BASE_URL}"
@@ -145,9 +191,12 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['DATABASE_PATH'] = os.path.join(os.path.dirname(__file__), 'database.db')
 
 # Configure session management
-if Config.SESSION_TYPE == 'redis' and os.environ.get('REDIS_URL'):
+if Config.SESSION_TYPE == 'redis' and Config.REDIS_URL:
     import redis
-    app.config['SESSION_REDIS'] = redis.from_url(os.environ.get('REDIS_URL'))
+    # A bounded pool shared by the request threads rather than one connection per client
+    app.config['SESSION_REDIS'] = redis.Redis(
+        connection_pool=redis.ConnectionPool.from_url(Config.REDIS_URL, max_connections=50)
+    )
 else:
     app.config['SESSION_FILE_DIR'] = os.path.join(os.getcwd(), 'flask_session')
     os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
@@ -206,16 +255,81 @@ def get_current_user():
         }
     return auth_manager.get_current_user()
 
-def get_db_connection():
-    """Get database connection using configured path."""
-    conn = sqlite3.connect(app.config['DATABASE_PATH'])
+# Pooled database connections, shared by the request threads of this process
+DB_POOL_SIZE = 10
+
+# Retries for writes that still find the database locked after busy_timeout
+DB_WRITE_RETRIES = 3
+_DB_POOL = queue.Queue(maxsize=DB_POOL_SIZE)
+
+def _open_db_connection():
+    """Open a database connection using configured path, tuned for reuse."""
+    conn = sqlite3.connect(app.config['DATABASE_PATH'], check_same_thread=False, cached_statements=256)
+    # WAL lets readers run alongside the writer; it is persistent, so
+    # database.db-wal and database.db-shm stay next to the database
+    conn.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        PRAGMA foreign_keys=ON;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-64000;
+    ''')
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_db_connection():
+    """
+    Get the database connection for the current request.
+
+    The connection is borrowed from the pool on first use and returned by
+    release_db_connection() when the app context ends, so views must not
+    close it.
+    """
+    if 'db' not in g:
+        try:
+            g.db = _DB_POOL.get_nowait()
+        except queue.Empty:
+            # All pooled connections are busy, open an extra one
+            g.db = _open_db_connection()
+    return g.db
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    """Return the request's database connection to the pool."""
+    conn = g.pop('db', None)
+    if conn is not None:
+        # Discard anything a failed request left uncommitted
+        conn.rollback()
+        try:
+            _DB_POOL.put_nowait(conn)
+        except queue.Full:
+            # Overflow connection opened under load, don't grow the pool
+            conn.close()
+
+def run_db_write(conn, write):
+    """
+    Run write(conn) and commit, retrying with backoff if the database is locked.
+
+    busy_timeout already makes SQLite wait for the write lock; this covers
+    writers that still give up under heavy contention.
+    """
+    for attempt in range(DB_WRITE_RETRIES):
+        try:
+            result = write(conn)
+            conn.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if 'locked' not in str(e) or attempt == DB_WRITE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
 # Database initialization
 def init_db():
     """Initialize database with all required tables."""
-    conn = get_db_connection()
+    conn = _open_db_connection()
     cursor = conn.cursor()
 
     # Posts table
@@ -401,7 +515,20 @@ def init_db():
             VALUES (?, ?, ?, ?)
         ''', suppliers_data)
 
+    # Indexes for the dashboard, calendar, documents and tasks queries
+    cursor.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_tasks_archived_updated ON tasks(archived, updated_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_events_start ON calendar_events(start_date, start_time);
+        CREATE INDEX IF NOT EXISTS idx_documents_folder_date ON documents(folder, upload_date DESC);
+        CREATE INDEX IF NOT EXISTS idx_dtr_tag ON document_tag_relations(tag_id);
+        CREATE INDEX IF NOT EXISTS idx_newsletters_received ON newsletters(received_at DESC) WHERE subject IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS idx_newsletters_recent ON newsletters(COALESCE(received_at, created_at) DESC);
+    ''')
+
     conn.commit()
+    # Refresh the query planner's statistics for the indexes above
+    conn.execute('ANALYZE')
     conn.close()
     print("Database initialized successfully with all tables")
 
@@ -515,7 +642,6 @@ def dashboard():
     tasks_dict = [dict(task) for task in tasks]
     events_dict = [dict(event) for event in events]
 
-    conn.close()
     return render_template('dashboard.html', user=user, newsletters=newsletters_dict, tasks=tasks_dict, events=events_dict)
 
 
@@ -537,7 +663,6 @@ def calendar():
     # Convert Row objects to dictionaries for JSON serialization
     events_dict = [dict(event) for event in events]
 
-    conn.close()
     return render_template('calendar.html', user=user, events=events_dict)
 
 @app.route('/calendar/create', methods=['POST'])
@@ -561,7 +686,6 @@ def create_event():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (title, description, start_date, end_date, start_time, end_time, location, user.get('mail'), user.get('displayName')))
         conn.commit()
-        conn.close()
         flash('Hendelse opprettet!')
     else:
         flash('Tittel og startdato er påkrevd')
@@ -588,17 +712,15 @@ def edit_event():
         # Check permissions - creator or admin can edit
         event = conn.execute('SELECT responsible_user_email FROM calendar_events WHERE id = ?', (event_id,)).fetchone()
         if event and (event['responsible_user_email'] == user.get('mail') or user.get('is_admin', False)):
-            conn.execute('''
+            run_db_write(conn, lambda conn: conn.execute('''
                 UPDATE calendar_events SET title = ?, description = ?, start_date = ?, end_date = ?,
                        start_time = ?, end_time = ?, location = ?
                 WHERE id = ?
-            ''', (title, description, start_date, end_date, start_time, end_time, location, event_id))
-            conn.commit()
+            ''', (title, description, start_date, end_date, start_time, end_time, location, event_id)))
             flash('Hendelse oppdatert!')
         else:
             flash('Du har ikke tilgang til å redigere denne hendelsen')
 
-        conn.close()
     else:
         flash('Hendelse-ID, tittel og startdato er påkrevd')
 
@@ -620,7 +742,6 @@ def delete_event(event_id):
     else:
         flash('Du har ikke tilgang til å slette denne hendelsen')
 
-    conn.close()
     return redirect(url_for('calendar'))
 
 
@@ -640,31 +761,43 @@ def documents(folder=None):
 
     conn = get_db_connection()
     if folder:
-        documents_list = conn.execute('''
-            SELECT id, original_filename, filename, upload_date, uploaded_by_name
-            FROM documents WHERE folder = ? ORDER BY upload_date DESC
+        # Fetch the folder's documents together with their tags in one query,
+        # one row per document/tag pair (tag columns are NULL for untagged documents)
+        rows = conn.execute('''
+            SELECT d.id, d.original_filename, d.filename, d.upload_date, d.uploaded_by_name, d.comment,
+                   ut.id AS tag_id, ut.name AS tag_name, ut.color AS tag_color,
+                   ut.created_by_email AS tag_created_by_email
+            FROM documents d
+            LEFT JOIN document_tag_relations dtr ON dtr.document_id = d.id
+            LEFT JOIN user_tags ut ON ut.id = dtr.tag_id
+            WHERE d.folder = ?
+            ORDER BY d.upload_date DESC, d.id, ut.name
         ''', (folder,)).fetchall()
 
-        documents_dict = []
-        for doc in documents_list:
-            doc_dict = dict(doc)
-
-            # Get tags for this document
-            tags = conn.execute('''
-                SELECT ut.id, ut.name, ut.color, ut.created_by_email
-                FROM user_tags ut
-                JOIN document_tag_relations dtr ON ut.id = dtr.tag_id
-                WHERE dtr.document_id = ?
-                ORDER BY ut.name
-            ''', (doc['id'],)).fetchall()
-            doc_dict['tags'] = [dict(tag) for tag in tags]
-
-            # Add comment info (handle missing comment column for old documents)
-            comment = doc.get('comment') if 'comment' in doc.keys() else None
-            doc_dict['has_comment'] = bool(comment)
-            doc_dict['comment'] = comment or ''
-
-            documents_dict.append(doc_dict)
+        # Group the rows back into one dict per document, keeping the order
+        documents_by_id = {}
+        for row in rows:
+            doc_dict = documents_by_id.get(row['id'])
+            if doc_dict is None:
+                comment = row['comment']
+                doc_dict = documents_by_id[row['id']] = {
+                    'id': row['id'],
+                    'original_filename': row['original_filename'],
+                    'filename': row['filename'],
+                    'upload_date': row['upload_date'],
+                    'uploaded_by_name': row['uploaded_by_name'],
+                    'tags': [],
+                    'has_comment': bool(comment),
+                    'comment': comment or '',
+                }
+            if row['tag_id'] is not None:
+                doc_dict['tags'].append({
+                    'id': row['tag_id'],
+                    'name': row['tag_name'],
+                    'color': row['tag_color'],
+                    'created_by_email': row['tag_created_by_email'],
+                })
+        documents_dict = list(documents_by_id.values())
     else:
         documents_dict = []
 
@@ -672,7 +805,6 @@ def documents(folder=None):
     all_tags = conn.execute('SELECT * FROM user_tags ORDER BY name').fetchall()
     all_tags_dict = [dict(tag) for tag in all_tags]
 
-    conn.close()
     return render_template('documents.html', user=user, current_folder=folder,
                          documents=documents_dict, folders=allowed_folders,
                          all_tags=all_tags_dict)
@@ -709,26 +841,35 @@ def upload_document():
         # Get comment from form
         comment = request.form.get('comment', '').strip() or None
 
-        # Insert document with comment
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name, comment)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (unique_filename, filename, folder, user.get('mail'), user.get('displayName'), comment))
-
-        doc_id = cursor.lastrowid
-
-        # Handle selected tags
         selected_tags = request.form.getlist('tags')
-        for tag_id in selected_tags:
-            if tag_id:  # Make sure tag_id is not empty
-                cursor.execute('''
-                    INSERT OR IGNORE INTO document_tag_relations (document_id, tag_id)
-                    VALUES (?, ?)
-                ''', (doc_id, tag_id))
 
-        conn.commit()
-        conn.close()
+        def insert_document(conn):
+            # Insert document with comment
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO documents (filename, original_filename, folder, uploaded_by_email, uploaded_by_name, comment)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (unique_filename, filename, folder, user.get('mail'), user.get('displayName'), comment))
+
+            doc_id = cursor.lastrowid
+
+            # Handle selected tags, skipping any deleted since the form was
+            # loaded (the foreign key would reject them)
+            for tag_id in selected_tags:
+                if tag_id:  # Make sure tag_id is not empty
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO document_tag_relations (document_id, tag_id)
+                        SELECT ?, id FROM user_tags WHERE id = ?
+                    ''', (doc_id, tag_id))
+
+        try:
+            run_db_write(conn, insert_document)
+        except sqlite3.Error:
+            app.logger.exception('Failed to record upload %s', unique_filename)
+            # Don't leave a file behind that no document row points to
+            os.remove(file_path)
+            flash(f'Kunne ikke laste opp "{filename}"')
+            return redirect(url_for('documents', folder=folder))
         flash(f'Fil "{filename}" lastet opp til {folder.title()}')
 
     return redirect(url_for('documents', folder=folder))
@@ -739,7 +880,6 @@ def download_document(doc_id):
     """Download document."""
     conn = get_db_connection()
     doc = conn.execute('SELECT filename, original_filename, folder FROM documents WHERE id = ?', (doc_id,)).fetchone()
-    conn.close()
 
     if doc:
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], doc['folder'])
@@ -763,7 +903,6 @@ def delete_document(doc_id):
                 os.remove(file_path)
         except OSError as e:
             flash(f'Kunne ikke slette fil fra disk: {str(e)}')
-            conn.close()
             return redirect(request.referrer or url_for('documents'))
 
         # Delete database record
@@ -773,7 +912,6 @@ def delete_document(doc_id):
     else:
         flash('Dokument ikke funnet')
 
-    conn.close()
     return redirect(request.referrer or url_for('documents'))
 
 # ========== TASKS ROUTES ==========
@@ -797,7 +935,6 @@ def tasks():
     # Convert Row objects to dictionaries for JSON serialization
     tasks_dict = [dict(task) for task in tasks_list]
 
-    conn.close()
     return render_template('tasks.html', user=user, tasks=tasks_dict)
 
 @app.route('/tasks/create', methods=['POST'])
@@ -818,7 +955,6 @@ def create_task():
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (title, description, priority, department, assigned_to or None, user.get('mail'), user.get('displayName')))
         conn.commit()
-        conn.close()
         flash('Oppgave opprettet!')
     else:
         flash('Tittel er påkrevd')
@@ -834,9 +970,8 @@ def update_task_status():
 
     if task_id and new_status in ['todo', 'in_progress', 'completed']:
         conn = get_db_connection()
-        conn.execute('UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (new_status, task_id))
-        conn.commit()
-        conn.close()
+        run_db_write(conn, lambda conn: conn.execute(
+            'UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (new_status, task_id)))
         flash('Oppgavestatus oppdatert!')
     else:
         flash('Ugyldig oppgave eller status')
@@ -862,7 +997,6 @@ def edit_task():
             WHERE id = ?
         ''', (title, description, priority, department, assigned_to or None, task_id))
         conn.commit()
-        conn.close()
         flash('Oppgave oppdatert!')
     else:
         flash('Oppgave-ID og tittel er påkrevd')
@@ -876,7 +1010,6 @@ def archive_task(task_id):
     conn = get_db_connection()
     conn.execute('UPDATE tasks SET archived = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (task_id,))
     conn.commit()
-    conn.close()
     flash('Oppgave arkivert!')
     return redirect(url_for('tasks'))
 
@@ -897,7 +1030,6 @@ def tasks_archive():
     # Convert Row objects to dictionaries for JSON serialization
     archived_tasks_dict = [dict(task) for task in archived_tasks]
 
-    conn.close()
     return render_template('tasks.html', user=user, tasks=archived_tasks_dict, archive_view=True)
 
 
@@ -914,7 +1046,6 @@ def suppliers():
     # Convert Row objects to dictionaries for JSON serialization
     suppliers_dict = [dict(supplier) for supplier in suppliers_list]
 
-    conn.close()
     return render_template('suppliers.html', user=user, suppliers=suppliers_dict)
 
 @app.route('/suppliers/add', methods=['POST'])
@@ -931,7 +1062,6 @@ def add_supplier():
         conn.execute('INSERT INTO suppliers (name, username, password, website) VALUES (?, ?, ?, ?)',
                     (name, username, password, website))
         conn.commit()
-        conn.close()
         flash('Leverandør lagt til!')
     else:
         flash('Leverandørnavn er påkrevd')
@@ -953,7 +1083,6 @@ def update_supplier():
         conn.execute('''UPDATE suppliers SET name = ?, username = ?, password = ?, website = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?''',
                     (name, username, password, website, supplier_id))
         conn.commit()
-        conn.close()
         flash('Leverandør oppdatert!')
     else:
         flash('Leverandørnavn er påkrevd')
@@ -967,7 +1096,6 @@ def delete_supplier(supplier_id):
     conn = get_db_connection()
     conn.execute('DELETE FROM suppliers WHERE id = ?', (supplier_id,))
     conn.commit()
-    conn.close()
     flash('Leverandør slettet!')
     return redirect(url_for('suppliers'))
 
@@ -996,7 +1124,6 @@ def newsletters():
             LIMIT 10
         ''').fetchall()
         newsletters = [dict(n) for n in newsletters]
-        conn.close()
 
     return render_template('newsletters/list.html', user=user, newsletters=newsletters)
 
@@ -1017,7 +1144,6 @@ def newsletter_detail(newsletter_id):
         ''', (newsletter_id,)).fetchone()
         if newsletter:
             newsletter = dict(newsletter)
-        conn.close()
 
     if not newsletter:
         flash('Nyhetsbrev ikke funnet')
@@ -1099,7 +1225,6 @@ def get_tags():
     """Get all available tags."""
     conn = get_db_connection()
     tags = conn.execute('SELECT * FROM user_tags ORDER BY name').fetchall()
-    conn.close()
     return jsonify({'tags': [dict(tag) for tag in tags]})
 
 @app.route('/api/tags', methods=['POST'])
@@ -1129,7 +1254,6 @@ def create_tag():
         ''', (name, color, user.get('mail'), user.get('displayName')))
         tag_id = cursor.lastrowid
         conn.commit()
-        conn.close()
 
         return jsonify({
             'status': 'success',
@@ -1169,8 +1293,6 @@ def delete_tag(tag_id):
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        conn.close()
 
 # ========== DOCUMENT TAG MANAGEMENT ==========
 @app.route('/api/documents/<int:doc_id>/tags', methods=['POST'])
@@ -1190,20 +1312,20 @@ def add_document_tag(doc_id):
     doc = conn.execute('SELECT uploaded_by_email FROM documents WHERE id = ?', (doc_id,)).fetchone()
 
     if not doc:
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Document not found'}), 404
 
     if not user.get('is_admin') and doc['uploaded_by_email'] != user.get('mail'):
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Permission denied'}), 403
 
+    if not conn.execute('SELECT 1 FROM user_tags WHERE id = ?', (tag_id,)).fetchone():
+        return jsonify({'status': 'error', 'message': 'Tag not found'}), 404
+
     try:
         conn.execute('''
             INSERT OR IGNORE INTO document_tag_relations (document_id, tag_id)
             VALUES (?, ?)
         ''', (doc_id, tag_id))
         conn.commit()
-        conn.close()
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1219,11 +1341,9 @@ def remove_document_tag(doc_id, tag_id):
     doc = conn.execute('SELECT uploaded_by_email FROM documents WHERE id = ?', (doc_id,)).fetchone()
 
     if not doc:
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Document not found'}), 404
 
     if not user.get('is_admin') and doc['uploaded_by_email'] != user.get('mail'):
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Permission denied'}), 403
 
     try:
@@ -1232,7 +1352,6 @@ def remove_document_tag(doc_id, tag_id):
             WHERE document_id = ? AND tag_id = ?
         ''', (doc_id, tag_id))
         conn.commit()
-        conn.close()
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1244,7 +1363,6 @@ def get_document_comment(doc_id):
     """Get document comment."""
     conn = get_db_connection()
     doc = conn.execute('SELECT comment FROM documents WHERE id = ?', (doc_id,)).fetchone()
-    conn.close()
 
     if not doc:
         return jsonify({'status': 'error', 'message': 'Document not found'}), 404
@@ -1271,17 +1389,14 @@ def update_document_comment(doc_id):
     doc = conn.execute('SELECT uploaded_by_email FROM documents WHERE id = ?', (doc_id,)).fetchone()
 
     if not doc:
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Document not found'}), 404
 
     if not user.get('is_admin') and doc['uploaded_by_email'] != user.get('mail'):
-        conn.close()
         return jsonify({'status': 'error', 'message': 'Permission denied'}), 403
 
     try:
         conn.execute('UPDATE documents SET comment = ? WHERE id = ?', (comment, doc_id))
         conn.commit()
-        conn.close()
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1301,7 +1416,6 @@ def create_post():
         conn.execute('INSERT INTO posts (user_email, user_name, title, content) VALUES (?, ?, ?, ?)',
                     (user.get('mail'), user.get('displayName'), title, content))
         conn.commit()
-        conn.close()
         flash('Innlegg publisert!')
     else:
         flash('Vennligst fyll ut alle felt')
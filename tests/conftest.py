@@ -0,0 +1,28 @@
+"""
+Shared pytest fixtures.
+
+The apps open database.db, uploads/ and flask_session/ relative to the
+working directory, so every test session runs in its own temporary
+directory and never touches the checked-in database.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Filesystem sessions; the Redis client is optional and not needed here
+os.environ['SESSION_TYPE'] = 'filesystem'
+os.environ.pop('REDIS_URL', None)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def workdir(tmp_path_factory):
+    """Run the whole session in an empty temporary directory."""
+    path = tmp_path_factory.mktemp('intranet')
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
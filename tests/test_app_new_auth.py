@@ -0,0 +1,86 @@
+"""Tests for app_new's calls to the auth backend."""
+import http.client
+import socket
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def app_new():
+    import app_new
+    return app_new
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    def read(self):
+        return self.body
+
+
+class FakeConnection:
+    """
+    Stand-in for http.client.HTTPConnection. Each request takes the next
+    outcome from `outcomes`: an exception to raise or a (status, body) pair.
+    """
+
+    outcomes = []
+    opened = []
+
+    def __init__(self, host, port, timeout=None):
+        self.timeout = timeout
+        self.requests = 0
+        FakeConnection.opened.append(self)
+
+    def request(self, method, url, headers=None):
+        self.requests += 1
+        outcome = FakeConnection.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        self.response = FakeResponse(*outcome)
+
+    def getresponse(self):
+        return self.response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def backend(app_new, monkeypatch):
+    monkeypatch.setattr(http.client, 'HTTPConnection', FakeConnection)
+    monkeypatch.setattr(app_new._auth_local, 'conn', None, raising=False)
+    FakeConnection.outcomes = []
+    FakeConnection.opened = []
+    return FakeConnection
+
+
+def current_user(app_new):
+    with app_new.app.test_request_context(headers={'Cookie': 'session=abc'}):
+        return app_new.get_current_user()
+
+
+def test_user_is_returned(app_new, backend):
+    backend.outcomes = [(200, b'{"name": "Ola"}')]
+    assert current_user(app_new) == {'name': 'Ola'}
+    assert backend.opened[0].timeout == app_new.AUTH_BACKEND_TIMEOUT
+
+
+def test_stale_keep_alive_connection_is_retried_once(app_new, backend):
+    backend.outcomes = [http.client.RemoteDisconnected('closed'), (200, b'{"name": "Ola"}')]
+    assert current_user(app_new) == {'name': 'Ola'}
+    assert len(backend.opened) == 2
+
+
+@pytest.mark.parametrize('error', [socket.timeout('timed out'), ConnectionRefusedError()])
+def test_timeouts_and_refusals_are_not_retried(app_new, backend, error):
+    backend.outcomes = [error]
+    assert current_user(app_new) is None
+    assert sum(conn.requests for conn in backend.opened) == 1
+
+
+def test_unauthenticated_response(app_new, backend):
+    backend.outcomes = [(401, b'{"error": "Authentication required"}')]
+    assert current_user(app_new) is None
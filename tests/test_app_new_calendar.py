@@ -0,0 +1,88 @@
+"""Tests for the month-limited calendar in app_new."""
+import sqlite3
+from datetime import date
+
+import pytest
+
+USER = {'email': 'ola@grm.no', 'name': 'Ola Nordmann', 'is_admin': False}
+
+
+@pytest.fixture(scope='module')
+def app_new():
+    import app_new
+    app_new.init_db()
+    return app_new
+
+
+@pytest.fixture
+def rendered(app_new, monkeypatch):
+    """Capture the context handed to render_template instead of rendering."""
+    calls = []
+
+    def render_template(name, **context):
+        calls.append(context)
+        return ''
+    monkeypatch.setattr(app_new, 'render_template', render_template)
+    return calls
+
+
+@pytest.fixture
+def client(app_new, monkeypatch):
+    monkeypatch.setattr(app_new, 'get_current_user', lambda: USER)
+    conn = sqlite3.connect('database.db')
+    conn.execute('DELETE FROM calendar_events')
+    conn.executemany('INSERT INTO calendar_events (title, start_date) VALUES (?, ?)', [
+        ('Romjul', '2024-12-29'),
+        ('Nyttårsaften', '2024-12-31'),
+        ('Nyttår', '2025-01-01'),
+        ('Ferie', '2025-01-31'),
+        ('Vinterferie', '2025-02-09'),
+        ('Fastelavn', '2025-02-10'),
+    ])
+    conn.commit()
+    conn.close()
+    return app_new.app.test_client()
+
+
+def titles(context):
+    return [event['title'] for event in context['events']]
+
+
+def test_events_of_the_whole_six_week_grid_are_loaded(client, rendered):
+    # January 2025 is drawn from Monday 30 December to Sunday 9 February
+    client.get('/calendar?year=2025&month=1')
+    assert titles(rendered[-1]) == ['Nyttårsaften', 'Nyttår', 'Ferie', 'Vinterferie']
+    assert (rendered[-1]['year'], rendered[-1]['month']) == (2025, 1)
+
+
+def test_grid_spans_the_turn_of_the_year(client, rendered):
+    # December 2024 is drawn from Monday 25 November to Sunday 5 January
+    client.get('/calendar?year=2024&month=12')
+    assert titles(rendered[-1]) == ['Romjul', 'Nyttårsaften', 'Nyttår']
+
+
+def test_new_event_redirects_to_its_month(app_new, client):
+    response = client.post('/create_event', data={'title': 'Sommerfest', 'start_date': '2025-06-20'})
+    assert response.headers['Location'].endswith('/calendar?year=2025&month=6')
+
+
+@pytest.mark.parametrize('query', ['year=2025&month=13', 'year=2025&month=0', 'year=9999&month=12'])
+def test_invalid_month_falls_back_to_the_current_month(client, rendered, query):
+    response = client.get(f'/calendar?{query}')
+    assert response.status_code == 200
+    today = date.today()
+    assert (rendered[-1]['year'], rendered[-1]['month']) == (today.year, today.month)
+
+
+def test_template_navigates_through_the_server_when_given_a_month():
+    # app_new has no edit_event route, so render with main.py's app
+    import main
+    from flask import render_template
+
+    with main.app.test_request_context('/calendar'):
+        page = render_template('calendar.html', user={}, events=[], year=2025, month=2)
+        assert 'const serverMonths = true;' in page
+        assert 'new Date(2025, 1, 1)' in page
+
+        page = render_template('calendar.html', user={}, events=[])
+        assert 'const serverMonths = false;' in page
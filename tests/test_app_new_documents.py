@@ -0,0 +1,107 @@
+"""Tests for the paginated document listing in app_new."""
+import sqlite3
+
+import pytest
+
+USER = {'email': 'ola@grm.no', 'name': 'Ola Nordmann', 'is_admin': False}
+
+
+@pytest.fixture(scope='module')
+def app_new():
+    import app_new
+    app_new.init_db()
+    return app_new
+
+
+@pytest.fixture
+def client(app_new, monkeypatch):
+    monkeypatch.setattr(app_new, 'get_current_user', lambda: USER)
+    conn = sqlite3.connect('database.db')
+    conn.execute('DELETE FROM documents')
+    conn.commit()
+    conn.close()
+    return app_new.app.test_client()
+
+
+@pytest.fixture
+def rendered(app_new, monkeypatch):
+    """Capture the context handed to render_template instead of rendering."""
+    calls = []
+
+    def render_template(name, **context):
+        calls.append(context)
+        return ''
+    monkeypatch.setattr(app_new, 'render_template', render_template)
+    return calls
+
+
+def add_documents(count, folder='salg'):
+    conn = sqlite3.connect('database.db')
+    conn.executemany(
+        'INSERT INTO documents (filename, original_filename, folder, uploaded_by_name, upload_date) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [(f'{i}.pdf', f'Dokument {i}.pdf', folder, 'Ola', f'2024-01-01 00:00:{i:02d}')
+         for i in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_documents_are_paginated(app_new, client, rendered):
+    per_page = app_new.DOCUMENTS_PER_PAGE
+    add_documents(per_page + 5)
+    add_documents(3, folder='hms')
+
+    client.get('/documents/salg')
+    first = rendered[-1]
+    assert first['page'] == 1
+    assert first['per_page'] == per_page
+    assert first['total'] == per_page + 5
+    assert len(first['documents']) == per_page
+    # Newest first
+    assert first['documents'][0]['filename'] == f'{per_page + 4}.pdf'
+
+    client.get('/documents/salg?page=2')
+    second = rendered[-1]
+    assert second['page'] == 2
+    assert second['total'] == per_page + 5
+    assert [doc['filename'] for doc in second['documents']] == [f'{i}.pdf' for i in range(4, -1, -1)]
+
+
+def test_page_past_the_end_redirects_to_first_page(client, rendered):
+    add_documents(2)
+
+    response = client.get('/documents/salg?page=3')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/documents/salg')
+    assert rendered == []
+
+
+def test_invalid_page_is_clamped_to_first_page(client, rendered):
+    add_documents(2)
+
+    client.get('/documents/salg?page=0')
+    assert rendered[-1]['page'] == 1
+    assert len(rendered[-1]['documents']) == 2
+
+
+def test_empty_folder_has_no_total(client, rendered):
+    client.get('/documents/it')
+    assert rendered[-1]['documents'] == []
+    assert rendered[-1]['total'] == 0
+
+
+def test_pager_links_to_neighbouring_pages(app_new, client):
+    add_documents(app_new.DOCUMENTS_PER_PAGE + 1)
+
+    page = client.get('/documents/salg?page=2').get_data(as_text=True)
+    assert 'Side 2 av 2' in page
+    assert '/documents/salg?page=1' in page
+    assert '/documents/salg?page=3' not in page
+
+
+def test_pager_hidden_for_a_single_page(client):
+    add_documents(2)
+
+    page = client.get('/documents/salg').get_data(as_text=True)
+    assert 'Side 1 av 1' not in page
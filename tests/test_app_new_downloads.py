@@ -0,0 +1,60 @@
+"""Tests for document downloads in app_new."""
+import os
+import sqlite3
+
+import pytest
+
+USER = {'email': 'ola@grm.no', 'name': 'Ola Nordmann', 'is_admin': False}
+
+
+@pytest.fixture(scope='module')
+def app_new():
+    import app_new
+    app_new.init_db()
+    return app_new
+
+
+@pytest.fixture
+def client(app_new, monkeypatch):
+    monkeypatch.setattr(app_new, 'get_current_user', lambda: USER)
+    return app_new.app.test_client()
+
+
+def add_document(app_new, filename, original_filename, folder='salg'):
+    with open(os.path.join(app_new._UPLOAD_DIRS[folder], filename), 'wb') as f:
+        f.write(b'%PDF-1.4')
+    conn = sqlite3.connect('database.db')
+    doc_id = conn.execute(
+        'INSERT INTO documents (filename, original_filename, folder) VALUES (?, ?, ?)',
+        (filename, original_filename, folder)
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return doc_id
+
+
+@pytest.mark.parametrize('original_filename', [
+    'Tilbud.pdf',
+    'Tilbud "endelig".pdf',
+    'Møtereferat æøå.pdf',
+    '報告.pdf',
+])
+def test_x_accel_disposition_matches_send_file(app_new, client, monkeypatch, original_filename):
+    doc_id = add_document(app_new, '20240101_000000_fil.pdf', original_filename)
+    direct = client.get(f'/download/{doc_id}')
+
+    monkeypatch.setitem(app_new.app.config, 'X_ACCEL_REDIRECT_PREFIX', '/internal-uploads/')
+    accel = client.get(f'/download/{doc_id}')
+
+    assert direct.status_code == accel.status_code == 200
+    assert accel.headers['Content-Disposition'] == direct.headers['Content-Disposition']
+    assert accel.get_data() == b''
+
+
+def test_x_accel_redirect_path_is_quoted(app_new, client, monkeypatch):
+    monkeypatch.setitem(app_new.app.config, 'X_ACCEL_REDIRECT_PREFIX', '/internal-uploads/')
+    doc_id = add_document(app_new, '20240101_000000_a b#1.pdf', 'a b#1.pdf')
+
+    response = client.get(f'/download/{doc_id}')
+    assert response.headers['X-Accel-Redirect'] == '/internal-uploads/salg/20240101_000000_a%20b%231.pdf'
+    assert 'Content-Type' not in response.headers
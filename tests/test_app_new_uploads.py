@@ -0,0 +1,59 @@
+"""Tests for document uploads in app_new."""
+import io
+import os
+import sqlite3
+
+import pytest
+
+USER = {'mail': 'ola@grm.no', 'displayName': 'Ola Nordmann', 'is_admin': False}
+
+
+@pytest.fixture(scope='module')
+def app_new():
+    import app_new
+    app_new.init_db()
+    return app_new
+
+
+@pytest.fixture
+def client(app_new, monkeypatch):
+    monkeypatch.setattr(app_new, 'get_current_user', lambda: USER)
+    return app_new.app.test_client()
+
+
+def upload(client, filename, folder='hms'):
+    data = {'folder': folder, 'file': (io.BytesIO(b'%PDF-1.4'), filename)}
+    return client.post('/upload_document', data=data, content_type='multipart/form-data')
+
+
+def uploaded_files(app_new, folder='hms'):
+    return set(os.listdir(app_new._UPLOAD_DIRS[folder]))
+
+
+def test_upload_is_recorded_before_the_redirect(app_new, client):
+    before = uploaded_files(app_new)
+
+    response = upload(client, 'rutiner.pdf')
+    assert response.status_code == 302
+
+    conn = sqlite3.connect('database.db')
+    row = conn.execute(
+        "SELECT filename, uploaded_by_email FROM documents WHERE original_filename = 'rutiner.pdf'"
+    ).fetchone()
+    conn.close()
+    assert row[1] == 'ola@grm.no'
+    assert uploaded_files(app_new) - before == {row[0]}
+
+
+def test_failed_upload_leaves_no_file_behind(app_new, client, monkeypatch):
+    closed = sqlite3.connect(':memory:')
+    closed.close()
+    monkeypatch.setattr(app_new, 'get_db', lambda: closed)
+    flashed = []
+    monkeypatch.setattr(app_new, 'flash', flashed.append)
+    before = uploaded_files(app_new)
+
+    response = upload(client, 'avvist.pdf')
+    assert response.status_code == 302
+    assert uploaded_files(app_new) == before
+    assert flashed == ['Kunne ikke laste opp "avvist.pdf"']
@@ -0,0 +1,215 @@
+"""Tests for the auth backend's coalesced token refreshes."""
+import importlib
+import os
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask, session
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'intranet', 'backend')
+
+
+@pytest.fixture(scope='module')
+def backend_auth():
+    """Import intranet/backend/auth.py without clashing with the root config module."""
+    saved = {name: sys.modules.pop(name) for name in ('config', 'auth') if name in sys.modules}
+    sys.path.insert(0, BACKEND)
+    try:
+        return importlib.import_module('auth')
+    finally:
+        sys.path.remove(BACKEND)
+        for name in ('config', 'auth'):
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+class FakeMsalApp:
+    """Counts silent token requests, each taking a moment like a real one."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def acquire_token_silent(self, scopes, account):
+        self.calls += 1
+        time.sleep(0.05)
+        return {'access_token': f'token-{self.calls}', 'expires_in': 3600}
+
+
+@pytest.fixture
+def manager(backend_auth, monkeypatch):
+    manager = backend_auth.AuthManager()
+    manager._initialized = True
+    msal_app = FakeMsalApp()
+    monkeypatch.setattr(manager, '_load_token_cache', lambda user_id: None)
+    monkeypatch.setattr(manager, '_save_token_cache', lambda user_id, cache: None)
+    monkeypatch.setattr(manager, '_build_msal_app', lambda cache=None: msal_app)
+    monkeypatch.setattr(manager, '_find_account', lambda *args: {'home_account_id': 'oid'})
+    manager.msal = msal_app
+    return manager
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    return app
+
+
+def refresh_as(app, manager, user_id):
+    with app.test_request_context():
+        session['user_id'] = user_id
+        return manager.refresh_token(), session.get('access_token')
+
+
+def test_concurrent_refreshes_share_one_msal_call(app, manager):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(refresh_as(app, manager, 'oid')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.msal.calls == 1
+    assert results == [(True, 'token-1')] * 5
+
+
+def test_refresh_locks_are_dropped_when_idle(app, manager):
+    refresh_as(app, manager, 'oid')
+    assert manager._refresh_locks == {}
+
+
+def test_refresh_lock_is_dropped_when_no_account_is_found(app, manager, monkeypatch):
+    monkeypatch.setattr(manager, '_find_account', lambda *args: None)
+    assert refresh_as(app, manager, 'oid') == (False, None)
+    assert manager._refresh_locks == {}
+
+
+def test_stale_results_are_evicted(app, manager, backend_auth, monkeypatch):
+    monkeypatch.setattr(backend_auth, 'TOKEN_REFRESH_REUSE', 0.01)
+    refresh_as(app, manager, 'first')
+    time.sleep(0.02)
+    refresh_as(app, manager, 'second')
+
+    assert list(manager._recent_refreshes) == ['second']
+
+
+def test_recent_result_is_reused(app, manager):
+    assert refresh_as(app, manager, 'oid') == (True, 'token-1')
+    assert refresh_as(app, manager, 'oid') == (True, 'token-1')
+    assert manager.msal.calls == 1
+
+
+class FakeCache:
+    """Serialized token cache stand-in that records whether MSAL changed it."""
+
+    def __init__(self, data):
+        self.data = data
+        self.has_state_changed = False
+
+    def serialize(self):
+        return self.data
+
+
+class PrefetchMsalApp:
+    """
+    Cached tokens are close to expiry until a forced refresh replaces the
+    cache; `during_refresh` runs in the middle of that refresh.
+    """
+
+    def __init__(self, cache, during_refresh=None):
+        self.cache = cache
+        self.during_refresh = during_refresh
+
+    def acquire_token_silent(self, scopes, account, force_refresh=False):
+        if force_refresh:
+            if self.during_refresh:
+                self.during_refresh()
+            self.cache.data = b'refreshed'
+            self.cache.has_state_changed = True
+        expires_in = 3600 if self.cache.data == b'refreshed' else 330
+        return {'access_token': self.cache.data.decode(), 'expires_in': expires_in}
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    def get(self, key):
+        return self.redis.get(key)
+
+    def multi(self):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.queued.append((key, value))
+
+
+class FakeRedis:
+    def __init__(self, store):
+        self.store = dict(store)
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def transaction(self, func, *watches):
+        pipe = FakePipeline(self)
+        func(pipe)
+        for key, value in pipe.queued:
+            self.store[key] = value
+
+
+@pytest.fixture
+def prefetching(backend_auth, monkeypatch):
+    """An AuthManager whose MSAL client works on FakeCache token caches."""
+    manager = backend_auth.AuthManager()
+    manager._initialized = True
+    manager.during_refresh = None
+    monkeypatch.setattr(manager, '_deserialize_token_cache', FakeCache)
+    monkeypatch.setattr(manager, '_build_msal_app',
+                        lambda cache=None: PrefetchMsalApp(cache, manager.during_refresh))
+    monkeypatch.setattr(manager, '_find_account', lambda *args: {'home_account_id': 'oid'})
+    return manager
+
+
+def prefetch_as(app, manager, user_id):
+    with app.test_request_context():
+        session['user_id'] = user_id
+        session['token_expires_at'] = time.time() + 330
+        manager.prefetch_token()
+        return session.get('access_token')
+
+
+def test_prefetch_stores_the_new_cache_and_forgets_the_future(app, prefetching):
+    redis = app.config['SESSION_REDIS'] = FakeRedis({'msal:oid': b'old'})
+
+    assert prefetch_as(app, prefetching, 'oid') == 'old'
+    prefetching._prefetch_executor.shutdown(wait=True)
+
+    assert redis.store['msal:oid'] == b'refreshed'
+    assert prefetching._prefetches == {}
+    # The next request copies the new token into its session
+    assert prefetch_as(app, prefetching, 'oid') == 'refreshed'
+
+
+def test_prefetch_does_not_overwrite_a_newer_cache(app, prefetching):
+    redis = app.config['SESSION_REDIS'] = FakeRedis({'msal:oid': b'old'})
+    prefetching.during_refresh = lambda: redis.set('msal:oid', b'from another worker')
+
+    prefetch_as(app, prefetching, 'oid')
+    prefetching._prefetch_executor.shutdown(wait=True)
+
+    assert redis.store['msal:oid'] == b'from another worker'
+    assert prefetching._prefetches == {}
+
+
+def test_prefetch_needs_redis(app, prefetching, monkeypatch):
+    # The background thread cannot write the session the cache would live in
+    monkeypatch.setattr(prefetching, '_prefetch_executor', None)
+    assert prefetch_as(app, prefetching, 'oid') is None
@@ -0,0 +1,65 @@
+"""Tests for main.py's Graph profile lookups."""
+import pytest
+import requests
+from requests.cookies import MockRequest, MockResponse
+from urllib3 import HTTPHeaderDict
+from flask import session
+
+PROFILE = {'id': 'oid-1', 'displayName': 'Ola Nordmann', 'userPrincipalName': 'ola@grm.no'}
+
+
+@pytest.fixture(scope='module')
+def main():
+    import main
+    return main
+
+
+@pytest.fixture
+def graph_calls(main, monkeypatch):
+    """Record calls to Graph's /me, answering with PROFILE."""
+    calls = []
+
+    def get_user_profile(access_token):
+        calls.append(access_token)
+        return dict(PROFILE)
+    monkeypatch.setattr(main.auth_manager, 'get_user_profile', get_user_profile)
+    return calls
+
+
+def test_profile_is_reused_within_the_ttl(main, graph_calls):
+    with main.app.test_request_context():
+        assert main.auth_manager.get_user_profile_cached('token', 'oid-1') == PROFILE
+        assert main.auth_manager.get_user_profile_cached('token', 'oid-1') == PROFILE
+        assert session['user'] == PROFILE
+    assert graph_calls == ['token']
+
+
+def test_profile_is_fetched_again_after_the_ttl(main, graph_calls):
+    with main.app.test_request_context():
+        main.auth_manager.get_user_profile_cached('token', 'oid-1')
+        session['user_fetched_at'] -= main.PROFILE_CACHE_TTL + 1
+        main.auth_manager.get_user_profile_cached('token-2', 'oid-1')
+    assert graph_calls == ['token', 'token-2']
+
+
+def test_profile_of_another_user_is_not_reused(main, graph_calls):
+    with main.app.test_request_context():
+        main.auth_manager.get_user_profile_cached('token', 'oid-1')
+        main.auth_manager.get_user_profile_cached('token-2', 'oid-2')
+    assert graph_calls == ['token', 'token-2']
+
+
+def test_failed_lookup_is_not_cached(main, monkeypatch):
+    monkeypatch.setattr(main.auth_manager, 'get_user_profile', lambda access_token: None)
+    with main.app.test_request_context():
+        assert main.auth_manager.get_user_profile_cached('token', 'oid-1') is None
+        assert 'user_fetched_at' not in session
+
+
+
+def test_graph_session_stores_no_cookies(main):
+    request = requests.Request('GET', 'https://graph.microsoft.com/v1.0/me').prepare()
+    headers = HTTPHeaderDict({'Set-Cookie': 'x-ms-gateway-slice=estsfd; Path=/'})
+
+    main._graph_session.cookies.extract_cookies(MockResponse(headers), MockRequest(request))
+    assert len(main._graph_session.cookies) == 0
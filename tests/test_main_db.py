@@ -0,0 +1,129 @@
+"""Tests for main.py's pooled SQLite connections."""
+import os
+import queue
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def main():
+    import main
+    main.app.config['DATABASE_PATH'] = os.path.abspath('database.db')
+    main.init_db()
+    return main
+
+
+@pytest.fixture
+def pool(main, monkeypatch):
+    """An empty pool of two connections, so overflow is easy to reach."""
+    pool = queue.Queue(maxsize=2)
+    monkeypatch.setattr(main, '_DB_POOL', pool)
+    return pool
+
+
+def test_connection_is_returned_to_the_pool_on_teardown(main, pool):
+    with main.app.app_context():
+        conn = main.get_db_connection()
+        # The same connection for the whole request
+        assert main.get_db_connection() is conn
+    assert pool.qsize() == 1
+
+    with main.app.app_context():
+        assert main.get_db_connection() is conn
+    assert pool.qsize() == 1
+
+
+def test_uncommitted_changes_are_rolled_back_on_teardown(main, pool):
+    with main.app.app_context():
+        conn = main.get_db_connection()
+        conn.execute("INSERT INTO posts (title, content) VALUES ('Utkast', 'Ikke lagret')")
+
+    with main.app.app_context():
+        conn = main.get_db_connection()
+        assert conn.execute("SELECT COUNT(*) FROM posts WHERE title = 'Utkast'").fetchone()[0] == 0
+
+
+def test_overflow_connections_are_closed(main, pool):
+    contexts = [main.app.app_context() for _ in range(3)]
+    connections = []
+    for ctx in contexts:
+        ctx.push()
+        connections.append(main.get_db_connection())
+    for ctx in reversed(contexts):
+        ctx.pop()
+
+    assert len(set(map(id, connections))) == 3
+    assert pool.qsize() == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute('SELECT 1')
+
+
+
+def test_pooled_connections_enforce_foreign_keys(main, pool):
+    with main.app.app_context():
+        conn = main.get_db_connection()
+        assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+
+class FlakyWrite:
+    """A write that finds the database locked a given number of times."""
+
+    def __init__(self, failures, message='database is locked'):
+        self.failures = failures
+        self.message = message
+        self.calls = 0
+
+    def __call__(self, conn):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise sqlite3.OperationalError(self.message)
+        return 'done'
+
+
+def test_run_db_write_retries_locked_writes(main, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(main.time, 'sleep', sleeps.append)
+    conn = sqlite3.connect(':memory:')
+    write = FlakyWrite(failures=main.DB_WRITE_RETRIES - 1)
+
+    assert main.run_db_write(conn, write) == 'done'
+    assert write.calls == main.DB_WRITE_RETRIES
+    # Exponential backoff between attempts
+    assert sleeps == [0.05 * 2 ** attempt for attempt in range(main.DB_WRITE_RETRIES - 1)]
+
+
+def test_run_db_write_gives_up_after_the_last_attempt(main, monkeypatch):
+    monkeypatch.setattr(main.time, 'sleep', lambda seconds: None)
+    conn = sqlite3.connect(':memory:')
+    write = FlakyWrite(failures=main.DB_WRITE_RETRIES)
+
+    with pytest.raises(sqlite3.OperationalError):
+        main.run_db_write(conn, write)
+    assert write.calls == main.DB_WRITE_RETRIES
+
+
+def test_run_db_write_does_not_retry_other_errors(main):
+    conn = sqlite3.connect(':memory:')
+    write = FlakyWrite(failures=1, message='no such table: posts')
+
+    with pytest.raises(sqlite3.OperationalError):
+        main.run_db_write(conn, write)
+    assert write.calls == 1
+
+
+def test_run_db_write_rolls_back_a_failed_attempt(main, monkeypatch):
+    monkeypatch.setattr(main.time, 'sleep', lambda seconds: None)
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE notes (text TEXT)')
+    attempts = []
+
+    def write(conn):
+        conn.execute("INSERT INTO notes VALUES ('hei')")
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError('database is locked')
+
+    main.run_db_write(conn, write)
+    assert conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 1
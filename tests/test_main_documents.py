@@ -0,0 +1,139 @@
+"""Tests for main.py's document views."""
+import io
+import os
+import queue
+import sqlite3
+
+import pytest
+
+SCREENSHOT_MODE = {'X-Screenshot-Mode': 'true'}
+
+
+@pytest.fixture(scope='module')
+def main():
+    import main
+    main.app.config['DATABASE_PATH'] = os.path.abspath('database.db')
+    main.init_db()
+    return main
+
+
+@pytest.fixture
+def db(main, monkeypatch):
+    monkeypatch.setattr(main, '_DB_POOL', queue.Queue(maxsize=2))
+    conn = sqlite3.connect('database.db')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.execute('DELETE FROM documents')
+    conn.execute('DELETE FROM user_tags')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(main):
+    return main.app.test_client()
+
+
+def add_tag(db, name, color='#ff0000'):
+    cursor = db.execute(
+        "INSERT INTO user_tags (name, color, created_by_email, created_by_name) VALUES (?, ?, 'ola@grm.no', 'Ola')",
+        (name, color)
+    )
+    db.commit()
+    return cursor.lastrowid
+
+
+def upload(client, filename, **form):
+    data = {'folder': 'salg', 'file': (io.BytesIO(b'%PDF-1.4'), filename), **form}
+    return client.post('/documents/upload', data=data, headers=SCREENSHOT_MODE,
+                       content_type='multipart/form-data')
+
+
+def test_upload_skips_tags_deleted_since_the_form_loaded(db, client):
+    kept = add_tag(db, 'Viktig')
+    deleted = add_tag(db, 'Gammel')
+    db.execute('DELETE FROM user_tags WHERE id = ?', (deleted,))
+    db.commit()
+
+    response = upload(client, 'tilbud.pdf', tags=[str(kept), str(deleted)])
+    assert response.status_code == 302
+
+    doc_id, filename = db.execute("SELECT id, filename FROM documents WHERE original_filename = 'tilbud.pdf'").fetchone()
+    tags = db.execute('SELECT tag_id FROM document_tag_relations WHERE document_id = ?', (doc_id,)).fetchall()
+    assert tags == [(kept,)]
+    assert os.path.exists(os.path.join('uploads', 'salg', filename))
+
+
+def test_failed_upload_leaves_no_file_behind(main, db, client, monkeypatch):
+    def run_db_write(conn, write):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(main, 'run_db_write', run_db_write)
+    before = set(os.listdir(os.path.join('uploads', 'salg')))
+
+    response = upload(client, 'avvist.pdf')
+    assert response.status_code == 302
+    assert set(os.listdir(os.path.join('uploads', 'salg'))) == before
+    assert db.execute('SELECT COUNT(*) FROM documents').fetchone()[0] == 0
+
+
+def test_tagging_with_a_missing_tag_is_404(db, client):
+    doc_id = db.execute(
+        "INSERT INTO documents (filename, original_filename, folder) VALUES ('a.pdf', 'a.pdf', 'salg')"
+    ).lastrowid
+    db.commit()
+
+    response = client.post(f'/api/documents/{doc_id}/tags', json={'tag_id': 999}, headers=SCREENSHOT_MODE)
+    assert response.status_code == 404
+    assert response.get_json()['message'] == 'Tag not found'
+
+
+@pytest.fixture
+def rendered(main, monkeypatch):
+    """Capture the context handed to render_template instead of rendering."""
+    calls = []
+
+    def render_template(name, **context):
+        calls.append(context)
+        return ''
+    monkeypatch.setattr(main, 'render_template', render_template)
+    return calls
+
+
+def add_document(db, name, upload_date, folder='salg', comment=None):
+    cursor = db.execute(
+        'INSERT INTO documents (filename, original_filename, folder, comment, upload_date) VALUES (?, ?, ?, ?, ?)',
+        (name, name, folder, comment, upload_date)
+    )
+    db.commit()
+    return cursor.lastrowid
+
+
+def tag_document(db, doc_id, *tag_ids):
+    db.executemany('INSERT INTO document_tag_relations (document_id, tag_id) VALUES (?, ?)',
+                   [(doc_id, tag_id) for tag_id in tag_ids])
+    db.commit()
+
+
+def test_folder_listing_groups_tags_per_document(db, client, rendered):
+    red = add_tag(db, 'Viktig', '#ff0000')
+    blue = add_tag(db, 'Arkiv', '#0000ff')
+    old = add_document(db, 'gammel.pdf', '2024-01-01 08:00:00', comment='Utgått')
+    new = add_document(db, 'ny.pdf', '2024-03-01 08:00:00')
+    untagged = add_document(db, 'notat.pdf', '2024-02-01 08:00:00')
+    add_document(db, 'annen.pdf', '2024-04-01 08:00:00', folder='hms')
+    tag_document(db, new, red, blue)
+    tag_document(db, old, blue)
+
+    client.get('/documents/salg', headers=SCREENSHOT_MODE)
+    documents = rendered[-1]['documents']
+
+    # One entry per document, newest first
+    assert [doc['id'] for doc in documents] == [new, untagged, old]
+    # Tags sorted by name
+    assert [tag['name'] for tag in documents[0]['tags']] == ['Arkiv', 'Viktig']
+    assert documents[0]['tags'][1] == {'id': red, 'name': 'Viktig', 'color': '#ff0000',
+                                       'created_by_email': 'ola@grm.no'}
+    assert documents[1]['tags'] == []
+    assert [tag['id'] for tag in documents[2]['tags']] == [blue]
+    assert documents[2]['has_comment'] and documents[2]['comment'] == 'Utgått'
+    assert not documents[0]['has_comment'] and documents[0]['comment'] == ''